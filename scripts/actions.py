@@ -1,5 +1,7 @@
 import numpy as np
-from habitat_sim.utils.common import quat_from_angle_axis
+
+from scripts.quaternion import quat_from_angle_axis
+from scripts.metrics import MOVE_OK, MOVE_RECOVERED, MOVE_BLOCKED
 
 STEP_SIZE = 0.25  # meters
 
@@ -34,6 +36,7 @@ def move_forward(agent, sim, distance):
     if pf.is_navigable(target):
         state.position = target
         agent.set_state(state)
+        MOVE_OK.inc()
         return True
 
     # 🔥 Fallback: small lateral wiggle search
@@ -56,8 +59,10 @@ def move_forward(agent, sim, distance):
             state.position = candidate
             agent.set_state(state)
             print(f"[RECOVER] move_forward sidestep {angle}°")
+            MOVE_RECOVERED.inc()
             return True
 
     print("[BLOCKED] move_forward blocked by collision")
+    MOVE_BLOCKED.inc()
     return False
 
@@ -1,52 +1,274 @@
 import os
 import json
+import time
+import shutil
+import tempfile
 import numpy as np
 
-from scripts.embodiment import make_sim, reset_agent, capture_frame, get_pose
+from scripts.embodiment import (
+    make_sim, reset_agent, render_sensors, capture_frame, capture_depth, get_pose
+)
 from scripts.actions import rotate, move_forward
 from scripts.view_memory import SpatialMemory
-from scripts.logging_utils import make_episode_dir, save_frame, save_episode_json
+from scripts.place_recognition import PlaceIndex
+from scripts.occupancy_map import OccupancyMap
+from scripts.exploration import FrontierPlanner
+from scripts.navigation import Navigator
+from scripts.render_policy import ResolutionPolicy, RecordingPolicy, RECORD_STRIDE
+from scripts.metrics import (
+    CONTROL_STEPS, SIM_STEPS, STEP_SECONDS, STEPS_PER_SECOND, EPISODES, EPISODE_SECONDS,
+    VLM_CALLS_SAVED,
+)
+from scripts.logging_utils import make_episode_dir, save_frame, save_episode_json, VideoFrameWriter
 from scripts.make_gallery import main as make_gallery
-from scripts.vlm_reasoner import VLMReasoner
+from scripts.vlm_reasoner import VLMReasoner, PipelinedReasoner
+from scripts.gridworld import GridworldSim, GridworldPerception, is_gridworld
 
 SCENE_DIR = "habitat_data/scene_datasets/habitat-test-scenes"
 MAX_RETRIES = 3
+MAX_STEPS = 25
+VLM_INTERVAL = 5
+CONTEXT_FRAMES = 6
+MAX_REPLANS = 2       # goto re-plans after a blocked / sidestepped move
 
 
-def run(scene_file, question="Find the bathroom"):
+def run(scene_file, question="Find the bathroom", frame_mode="png", use_depth=False,
+        explorer="reactive", sim_pool=None, use_panorama=False, low_res=None,
+        governor=None, place_recognition=False, pipeline=None, record_mode="every",
+        record_stride=None, reasoner=None):
     scene_path = os.path.join(SCENE_DIR, scene_file)
+    episode_t0 = time.perf_counter()
+
+    # Qwen loads in the background so weight loading overlaps with scene
+    # load and spawn search. run_episode shares one reasoner across
+    # episodes; a standalone run() creates (and frees) its own. With a
+    # pipeline the model lives in its perception process; gridworld scenes
+    # answer from ground truth.
+    owns_reasoner = False
+    if reasoner is None and pipeline is None and not is_gridworld(scene_path):
+        reasoner = VLMReasoner(background=True)
+        owns_reasoner = True
+
+    def release_reasoner():
+        if owns_reasoner:
+            reasoner.close()
+
+    # With a pool the simulator (scene mesh + navmesh) outlives the episode
+    if sim_pool is not None:
+        sim = sim_pool.acquire(
+            scene_path, depth=use_depth, panorama=use_panorama, low_res=low_res
+        )
+    else:
+        sim = make_sim(scene_path, depth=use_depth, panorama=use_panorama, low_res=low_res)
 
-    sim = make_sim(scene_path)
-    agent = reset_agent(sim)
+    def release_sim():
+        if sim_pool is not None:
+            sim_pool.release(sim)
+        else:
+            sim.close()
 
-    # Qwen-based reasoner
-    reasoner = VLMReasoner()
-    memory = SpatialMemory()
+    agent = reset_agent(sim)
+    sim_ready_s = time.perf_counter() - episode_t0
+
+    if pipeline is not None:
+        pipeline.new_episode()
+    if isinstance(sim, GridworldSim):
+        reasoner = VLMReasoner(backend=GridworldPerception(sim))
+    elif pipeline is not None:
+        reasoner = PipelinedReasoner(pipeline)
+    memory = SpatialMemory(
+        occupancy=OccupancyMap() if use_depth else None,
+        places=PlaceIndex() if place_recognition else None
+    )
 
     ep_id, ep_path = make_episode_dir()
     frames_dir = os.path.join(ep_path, "frames")
     os.makedirs(frames_dir, exist_ok=True)
 
+    # In video mode frames go into one encoded stream; the VLM still needs
+    # image files, so its context frames are written to a scratch dir.
+    video = None
+    context_dir = None
+    if frame_mode == "video":
+        video = VideoFrameWriter(ep_path)
+        context_dir = tempfile.mkdtemp(prefix=f"{ep_id}_ctx_")
+
+    def finish_frames():
+        if pipeline is not None:
+            pipeline.flush()
+        if video is not None:
+            video.close()
+            shutil.rmtree(context_dir, ignore_errors=True)
+
+    # Geodesic planner for returning to remembered nodes (cached per scene)
+    navigator = Navigator(sim.pathfinder, scene_file)
+
+    # Coverage is tracked for both explorers so their numbers compare;
+    # only "frontier" lets it drive non-VLM steps, "reactive" keeps the
+    # old forward / rotate-when-blocked fallback.
+    coverage = FrontierPlanner(sim.pathfinder, occupancy=memory.occupancy, navigator=navigator)
+    planner = coverage if explorer == "frontier" else None
+
     last_vlm_result = None
+    sim_steps = 0
+    vlm_calls = 0
+    places_reused = 0
+    nav_steps = 0          # goto sub-actions, counted against MAX_STEPS
+    goto_targets = set()   # landmark nodes already returned to
+    blocked_moves = 0
+    off_course = False     # last move_forward was blocked or sidestepped
+    success = False
+    stop_requested = False
+
+    # Full-res "rgb" only for frames that get saved / sent to the VLM
+    resolution = ResolutionPolicy(VLM_INTERVAL) if low_res else None
+    # Which actions get a frame at all; the others only log their pose
+    recording = RecordingPolicy(
+        record_mode, vlm_interval=VLM_INTERVAL, stride=record_stride or RECORD_STRIDE
+    )
+    current_step = 0
 
     # -------------------------
     # Logging helper
     # -------------------------
-    def record(action):
-        frame = capture_frame(sim)
+    def record(action, sensor="rgb"):
+        panoramic = sensor == "panorama"
         pose = get_pose(agent)
 
+        # Nothing rendered, checked or encoded; exploration coverage is
+        # geometric, so the planner still sees every pose
+        if not recording.should_render(current_step, action, pose):
+            coverage.observe(pose)
+            memory.add_view(None, pose, action)
+            memory.views[-1]["unrendered"] = True
+            return True
+
+        persist = True
+        if resolution is not None and sensor == "rgb" and not resolution.high_res(current_step, action):
+            sensor = "rgb_low"
+            persist = False
+
+        # Depth at the color sensor's resolution
+        depth_uuid = "depth_low" if sensor == "rgb_low" else "depth"
+        uuids = [sensor] if panoramic or not use_depth else [sensor, depth_uuid]
+        obs = render_sensors(sim, uuids)
+        frame = capture_frame(sim, obs, uuid=sensor)
+
+        # Geometry is fused even when the RGB frame is rejected
+        memory.integrate_depth(capture_depth(obs, depth_uuid), pose)
+        coverage.observe(pose, hfov=360.0 if panoramic else None)
+
         if frame is None:
             print(f"[WARN] Bad frame after action: {action}")
             memory.add_view(None, pose, action)
             return False
 
+        # Control-only step: pose is logged, low-res frame is not kept
+        if not persist:
+            memory.add_view(None, pose, action)
+            memory.views[-1]["low_res"] = True
+            return True
+
         vid = memory.add_view(frame, pose, action)
+        if panoramic:
+            memory.views[-1]["panorama"] = True
+
+        # Panoramas don't match the video frame size; they stay PNGs
+        if video is not None and not panoramic:
+            memory.views[-1]["frame_index"] = video.write(frame, vid)
+            memory.views[-1]["frame_path"] = video.path
+            if pipeline is not None:
+                pipeline.publish(frame, vid)
+            return True
+
         path = os.path.join(frames_dir, f"{vid}.png")
-        save_frame(frame, path)
+        if pipeline is not None:
+            # PNG encoding happens in the writer stage
+            pipeline.publish(frame, vid, path=path)
+        else:
+            save_frame(frame, path)
         memory.views[-1]["frame_path"] = path
         return True
 
+    def vlm_frame_path(view):
+        if video is None:
+            return view["frame_path"]
+
+        path = os.path.join(context_dir, f"{view['id']}.png")
+        if not os.path.exists(path):
+            if view.get("frame") is None:
+                # Pixels evicted by the memory governor
+                return None
+            save_frame(view["frame"], path)
+        return path
+
+    # -------------------------
+    # Symbolic action executor
+    # -------------------------
+    def execute(act):
+        """Run one symbolic action. Returns False when the episode should stop."""
+        nonlocal sim_steps, nav_steps, off_course, blocked_moves
+        a = act.get("action")
+
+        if a == "move_forward":
+            dist = act.get("distance", 0.6)
+            rotation_before = get_pose(agent)["rotation"]
+            ok = move_forward(agent, sim, dist)
+            # A sidestep recovery also turns the agent, so relative plans
+            # compiled from the old pose no longer hold
+            off_course = not ok or get_pose(agent)["rotation"] != rotation_before
+            sim_steps += 1
+            SIM_STEPS.inc()
+            record("move_forward" if ok else "blocked")
+            if not ok:
+                blocked_moves += 1
+                if planner is not None:
+                    planner.report_blocked()
+
+        elif a == "rotate":
+            ang = act.get("angle_deg", 30)
+            rotate(agent, sim, ang)
+            sim_steps += 1
+            SIM_STEPS.inc()
+            record(f"rotate{ang:+d}")
+
+        elif a == "scan":
+            if use_panorama:
+                # One equirectangular render replaces the rotate-and-record sweep
+                sim_steps += 1
+                SIM_STEPS.inc()
+                record("scan", sensor="panorama")
+            else:
+                rotate(agent, sim, 30)
+                sim_steps += 1
+                SIM_STEPS.inc()
+                record("scan")
+
+        elif a == "goto":
+            node = act.get("node")
+            goto_targets.add(node)
+            for attempt in range(MAX_REPLANS + 1):
+                plan = navigator.plan_to_node(memory, get_pose(agent), node)
+                print(f"[NAV] goto {node}: {len(plan)} actions" + (f" (replan {attempt})" if attempt else ""))
+                off_course = False
+                for sub in plan:
+                    # Every navigation action is charged to the episode budget
+                    if current_step + nav_steps >= MAX_STEPS:
+                        print("[NAV] Step budget exhausted during goto")
+                        return False
+                    nav_steps += 1
+                    if not execute(sub):
+                        return False
+                    if off_course:
+                        break
+                if not off_course:
+                    break
+
+        elif a == "stop":
+            return False
+
+        return True
+
     # -------------------------
     # Spawn frame
     # -------------------------
@@ -56,19 +278,38 @@ def run(scene_file, question="Find the bathroom"):
         print(f"[RETRY] spawn attempt {attempt+1}")
     else:
         print("[FATAL] Could not capture valid spawn frame")
-        sim.close()
+        finish_frames()
+        release_sim()
+        release_reasoner()
+        EPISODES.labels(outcome="no_spawn").inc()
         return None
 
     # -------------------------
     # Control loop
     # -------------------------
-    MAX_STEPS = 25
-    VLM_INTERVAL = 5
-    CONTEXT_FRAMES = 6
+    steps_run = 0
+    loop_t0 = step_t0 = time.perf_counter()
 
     for step in range(MAX_STEPS):
+        current_step = step
+        if step + nav_steps >= MAX_STEPS:
+            break
+
+        # Per-step latency, measured boundary to boundary so every
+        # continue / break path is covered
+        if step > 0:
+            now = time.perf_counter()
+            STEP_SECONDS.observe(now - step_t0)
+            step_t0 = now
+        steps_run += 1
+        CONTROL_STEPS.inc()
         print(f"\n[STEP {step}]")
 
+        context_frames = CONTEXT_FRAMES
+        if governor is not None:
+            governor.check(memory=memory, backend=reasoner.backend)
+            context_frames = governor.context_frames(CONTEXT_FRAMES)
+
         use_vlm = (step % VLM_INTERVAL == 0 and step > 0)
 
         # ==========================================
@@ -81,30 +322,71 @@ def run(scene_file, question="Find the bathroom"):
                 return v.get("frame_path") is not None
 
             recent_views = [v for v in memory.views if is_informative(v)]
-            last_views = recent_views[-CONTEXT_FRAMES:]
+            last_views = recent_views[-context_frames:]
 
-            if len(last_views) >= 2:
-                frame_paths = [v["frame_path"] for v in last_views]
-                memory_summary = memory.export_json()[-CONTEXT_FRAMES:]
+            # A fresh panorama already covers the whole surroundings
+            if last_views and last_views[-1].get("panorama"):
+                last_views = last_views[-1:]
 
-                result = reasoner.reason(
-                    question=question,
-                    frame_paths=frame_paths,
-                    memory_summary=memory_summary
-                )
+            if len(last_views) >= 2 or (last_views and last_views[-1].get("panorama")):
+                memory_summary = memory.export_json()[-context_frames:]
 
-                # Update spatial memory with semantics
+                exploration_plan = None
+                if planner is not None:
+                    exploration_plan = planner.next_actions(get_pose(agent))
+
+                # Loop closure: a recognized place reuses its earlier perception
                 node_id = memory.get_recent_node()
+                place = memory.recognize_place(node_id)
+
+                # Nearest remembered door the reasoner can return to when stuck
+                landmarks = {}
+                doors = [
+                    n for n in memory.find_nodes(affordance="door")
+                    if n != node_id and n not in goto_targets
+                ]
+                door = navigator.nearest_node(memory, get_pose(agent)["position"], doors) if doors else None
+                if door is not None:
+                    landmarks["door"] = door
+
+                if place is not None:
+                    print(f"[PLACE] Revisit of {place['node_id']} (sim {place['similarity']:.2f}), skipping VLM")
+                    result = reasoner.recall(place, memory_summary, exploration_plan, landmarks)
+                    places_reused += 1
+                    VLM_CALLS_SAVED.inc()
+                else:
+                    if isinstance(reasoner, PipelinedReasoner):
+                        frame_paths = [v["id"] for v in last_views]
+                    else:
+                        if pipeline is not None:
+                            # reason() only uses frames that are already on disk
+                            pipeline.flush()
+                        frame_paths = [p for p in (vlm_frame_path(v) for v in last_views) if p]
+                    result = reasoner.reason(
+                        question=question,
+                        frame_paths=frame_paths,
+                        memory_summary=memory_summary,
+                        exploration_plan=exploration_plan,
+                        landmarks=landmarks
+                    )
+                    vlm_calls += 1
+
+                # Update spatial memory with semantics
                 memory.update_semantics(
                     node_id,
                     objects=result.get("visible_objects", []),
-                    scene_type=result.get("scene_type_guess")
+                    scene_type=result.get("scene_type_guess"),
+                    affordances=result.get("affordances", []),
+                    index=place is None
 )
 
 
 
                 memory.views[-1]["objects"] = result["visible_objects"]
                 memory.views[-1]["scene_type"] = result["scene_type_guess"]
+                memory.views[-1]["context_frames"] = context_frames
+                if place is not None:
+                    memory.views[-1]["place_match"] = place["node_id"]
 
 
                 last_vlm_result = result
@@ -112,51 +394,57 @@ def run(scene_file, question="Find the bathroom"):
                 print("[VLM] Thought:", result.get("reasoning"))
                 if result["scene_type_guess"] == "bathroom" or "toilet" in result["visible_objects"]:
                     print("[SUCCESS] Bathroom found!")
+                    success = True
                     break
 
-                print("[VLM] Actions:", result.get("next_action_plan"))
+                next_actions = result.get("next_actions", [])
+                print("[VLM] Actions:", next_actions)
 
                 # 🔥 EXECUTE SYMBOLIC ACTIONS
-                for act in result.get("next_action_plan", []):
-                    a = act.get("action")
-
-                    if a == "move_forward":
-                        dist = act.get("distance", 0.6)
-                        ok = move_forward(agent, sim, dist)
-                        record("move_forward" if ok else "blocked")
-
-                    elif a == "rotate":
-                        ang = act.get("angle_deg", 30)
-                        rotate(agent, sim, ang)
-                        record(f"rotate{ang:+d}")
-
-                    elif a == "scan":
-                        rotate(agent, sim, 30)
-                        record("scan")
-
-                    elif a == "stop":
-                        print("[VLM] Stop requested.")
-                        sim.close()
+                for act in next_actions:
+                    if not execute(act):
+                        stop_requested = True
                         break
 
+                if stop_requested:
+                    print("[VLM] Stop requested.")
+                    break
+
                 continue  # Skip reactive fallback on VLM step
 
             else:
                 print("[VLM] Not enough informative frames, falling back.")
 
         # ==========================================
-        # FALLBACK REACTIVE CONTROL
+        # FALLBACK CONTROL
         # ==========================================
+        if planner is not None:
+            for act in planner.next_actions(get_pose(agent)):
+                execute(act)
+            continue
+
         moved = move_forward(agent, sim, 0.6)
+        sim_steps += 1
+        SIM_STEPS.inc()
         if moved:
             record("move_forward")
         else:
+            blocked_moves += 1
             angle = 90
             print(f"[RECOVER] rotate {angle}°")
             rotate(agent, sim, angle)
+            sim_steps += 1
+            SIM_STEPS.inc()
             record(f"rotate{angle:+d}")
 
-    sim.close()
+    now = time.perf_counter()
+    STEP_SECONDS.observe(now - step_t0)
+    if now > loop_t0:
+        STEPS_PER_SECOND.set(steps_run / (now - loop_t0))
+
+    finish_frames()
+    navigator.save()
+    release_sim()
 
     # -------------------------
     # Save Episode JSON
@@ -166,9 +454,42 @@ def run(scene_file, question="Find the bathroom"):
         "scene": scene_file,
         "num_frames": len(memory.views),
         "pattern": "vlm_control_v1",
-        "question": question
+        "question": question,
+        "frame_mode": frame_mode,
+        "explorer": explorer,
+        "panorama": use_panorama,
+        "low_res": low_res,
+        "success": success,
+        "sim_steps": sim_steps,
+        "vlm_calls": vlm_calls,
+        "places_reused": places_reused
     }
 
+    meta["exploration"] = dict(
+        coverage.stats(),
+        blocked_moves=blocked_moves,
+        steps_to_goal=sim_steps if success else None
+    )
+    meta["navigation"] = dict(navigator.stats(), gotos=len(goto_targets))
+    if memory.places is not None:
+        meta["place_recognition"] = memory.places.stats()
+    if pipeline is not None:
+        meta["pipeline"] = pipeline.stats()
+    meta["recording"] = recording.stats()
+    if governor is not None:
+        meta["governor"] = {"level": governor.level, "log": governor.log}
+
+    meta["startup"] = {"sim_ready_s": sim_ready_s}
+    timings = getattr(reasoner.backend, "timings", None)
+    if timings is not None:
+        meta["startup"].update(timings)
+    print("[STARTUP]", meta["startup"])
+    release_reasoner()
+
+    if memory.occupancy is not None:
+        meta["occupancy"] = memory.occupancy.summary()
+        save_frame(memory.occupancy.to_image(), os.path.join(ep_path, "occupancy.png"))
+
     episode_json_path = os.path.join(ep_path, "episode.json")
     save_episode_json(
         episode_json_path,
@@ -189,6 +510,9 @@ def run(scene_file, question="Find the bathroom"):
     # -------------------------
     make_gallery(ep_path)
 
+    EPISODES.labels(outcome="success" if success else "incomplete").inc()
+    EPISODE_SECONDS.observe(time.perf_counter() - episode_t0)
+
     print(f"Episode complete: {ep_id}")
     print(f"Frames: {len(memory.views)}")
     print(f"Gallery: {ep_path}/index.html")
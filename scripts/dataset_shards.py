@@ -0,0 +1,311 @@
+'''
+python -m scripts.dataset_shards export --out outputs/shards
+python -m scripts.dataset_shards inspect --out outputs/shards
+'''
+import os
+import json
+import queue
+import random
+import argparse
+import threading
+
+import numpy as np
+from PIL import Image
+
+from scripts.logging_utils import VideoFrameReader
+
+EPISODES_DIR = "outputs/episodes"
+SHARDS_DIR = "outputs/shards"
+SAMPLES_PER_SHARD = 128      # ~96 MiB of 512x512 RGB frames per shard
+MANIFEST = "manifest.json"
+
+
+# -------------------------
+# Export
+# -------------------------
+def _iter_episode_samples(ep_path):
+    episode_json = os.path.join(ep_path, "episode.json")
+    if not os.path.exists(episode_json):
+        return
+
+    with open(episode_json, "r") as f:
+        data = json.load(f)
+
+    ep_id = data.get("meta", {}).get("episode_id", os.path.basename(ep_path))
+    readers = {}
+
+    for i, step in enumerate(data.get("trajectory", [])):
+        frame_path = step.get("frame_path")
+        if not frame_path or not os.path.exists(frame_path):
+            continue
+
+        if step.get("frame_index") is not None:
+            if frame_path not in readers:
+                readers[frame_path] = VideoFrameReader(frame_path)
+            frame = readers[frame_path].read(step["frame_index"])
+            if frame is None:
+                continue
+        else:
+            frame = np.asarray(Image.open(frame_path), dtype=np.uint8)
+
+        # PNGs are RGBA, video frames RGB: store everything as RGB
+        if frame.ndim == 2:
+            frame = np.repeat(frame[..., None], 3, axis=2)
+        frame = frame[..., :3]
+
+        pose = step.get("pose") or {}
+        yield {
+            "episode_id": ep_id,
+            "step": i,
+            "frame": frame,
+            "pose": list(pose.get("position", [0, 0, 0])) + list(pose.get("rotation", [1, 0, 0, 0])),
+            "action": step.get("action") or "unknown",
+            "objects": step.get("objects") or [],
+            "scene_type": step.get("scene_type") or "",
+        }
+
+    for reader in readers.values():
+        reader.close()
+
+
+class ShardWriter:
+    """
+    Packs samples into fixed-size shards.
+
+    Frames go to a plain (N, H, W, 3) uint8 .npy next to each shard so
+    readers can memory-map them. The .npz holds poses as (N, 7) float32
+    [x, y, z, qw, qx, qy, qz], actions as int codes into a shared
+    vocabulary, and per-sample object lists as a flat string array plus
+    offsets.
+    """
+
+    def __init__(self, out_dir=SHARDS_DIR, samples_per_shard=SAMPLES_PER_SHARD):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.samples_per_shard = samples_per_shard
+        self.buffer = []
+        self.shards = []
+        self.action_vocab = {}
+        self.frame_shape = None
+        self.skipped = 0      # frames whose size differs (e.g. panoramas)
+
+    def add(self, sample):
+        shape = sample["frame"].shape
+        if self.frame_shape is None:
+            self.frame_shape = shape
+        elif shape != self.frame_shape:
+            self.skipped += 1
+            return
+
+        self.buffer.append(sample)
+        if len(self.buffer) >= self.samples_per_shard:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        n = len(self.buffer)
+        frames = np.empty((n,) + self.frame_shape, dtype=np.uint8)
+        poses = np.empty((n, 7), dtype=np.float32)
+        actions = np.empty(n, dtype=np.int32)
+        steps = np.empty(n, dtype=np.int32)
+        object_offsets = np.zeros(n + 1, dtype=np.int64)
+        object_names = []
+
+        for i, s in enumerate(self.buffer):
+            frames[i] = s["frame"]
+            poses[i] = s["pose"]
+            actions[i] = self.action_vocab.setdefault(s["action"], len(self.action_vocab))
+            steps[i] = s["step"]
+            object_names.extend(s["objects"])
+            object_offsets[i + 1] = len(object_names)
+
+        name = f"shard_{len(self.shards):05d}.npz"
+        frames_name = name.replace(".npz", ".frames.npy")
+        np.save(os.path.join(self.out_dir, frames_name), frames)
+        np.savez(
+            os.path.join(self.out_dir, name),
+            poses=poses,
+            actions=actions,
+            steps=steps,
+            episode_ids=np.array([s["episode_id"] for s in self.buffer]),
+            scene_types=np.array([s["scene_type"] for s in self.buffer]),
+            object_names=np.array(object_names, dtype=str),
+            object_offsets=object_offsets,
+        )
+
+        self.shards.append({"file": name, "frames": frames_name, "num_samples": n})
+        print(f"[SHARDS] Wrote {name} ({n} samples)")
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.skipped:
+            print(f"[SHARDS] Skipped {self.skipped} frames not matching shape {self.frame_shape}")
+        vocab = sorted(self.action_vocab, key=self.action_vocab.get)
+        manifest = {
+            "shards": self.shards,
+            "num_samples": sum(s["num_samples"] for s in self.shards),
+            "frame_shape": list(self.frame_shape) if self.frame_shape else None,
+            "skipped_frames": self.skipped,
+            "actions": vocab,
+        }
+        with open(os.path.join(self.out_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def export(base=EPISODES_DIR, out_dir=SHARDS_DIR, samples_per_shard=SAMPLES_PER_SHARD):
+    writer = ShardWriter(out_dir, samples_per_shard)
+
+    for d in sorted(os.listdir(base)):
+        if not d.startswith("episode_"):
+            continue
+        for sample in _iter_episode_samples(os.path.join(base, d)):
+            writer.add(sample)
+
+    manifest = writer.close()
+    print(f"[SHARDS] Exported {manifest['num_samples']} samples in {len(manifest['shards'])} shards")
+    return manifest
+
+
+# -------------------------
+# Streaming loader
+# -------------------------
+class ShardStream:
+    """
+    Iterates (frame, pose, action, objects) samples from exported shards.
+
+    Shards are opened sequentially by `num_workers` prefetch threads;
+    frames are memory-mapped and copied out one sample at a time, so
+    resident memory is the shuffle buffer rather than whole shards.
+    Samples are mixed through a shuffle buffer of `shuffle_buffer` entries.
+    """
+
+    def __init__(self, shard_dir=SHARDS_DIR, shuffle_buffer=2048, num_workers=2,
+                 prefetch=2, seed=None, shuffle_shards=True):
+        with open(os.path.join(shard_dir, MANIFEST), "r") as f:
+            self.manifest = json.load(f)
+
+        self.shard_dir = shard_dir
+        self.actions = self.manifest["actions"]
+        self.shuffle_buffer = shuffle_buffer
+        self.num_workers = max(1, num_workers)
+        self.prefetch = max(1, prefetch)
+        self.seed = seed
+        self.shuffle_shards = shuffle_shards
+
+    def __len__(self):
+        return self.manifest["num_samples"]
+
+    def _load_shard(self, entry):
+        # Metadata is small and read eagerly; frames stay on disk
+        with np.load(os.path.join(self.shard_dir, entry["file"])) as z:
+            shard = {k: z[k] for k in z.files if k != "frames"}
+        shard["frames"] = np.load(os.path.join(self.shard_dir, entry["frames"]), mmap_mode="r")
+        return shard
+
+    def _shard_samples(self, shard):
+        offsets = shard["object_offsets"]
+        names = shard["object_names"]
+        for i in range(len(shard["actions"])):
+            objects = [str(o) for o in names[offsets[i]:offsets[i + 1]]]
+            yield (
+                # Own copy: a view would pin the whole mapped shard
+                np.array(shard["frames"][i]),
+                shard["poses"][i],
+                self.actions[int(shard["actions"][i])],
+                objects,
+            )
+
+    def _producer(self, entries, out_q, stop):
+        for entry in entries:
+            if stop.is_set():
+                break
+            out_q.put(self._load_shard(entry))
+        out_q.put(None)
+
+    def __iter__(self):
+        rng = random.Random(self.seed)
+        entries = list(self.manifest["shards"])
+        if self.shuffle_shards:
+            rng.shuffle(entries)
+
+        # Round-robin shard assignment keeps each worker reading sequentially
+        out_q = queue.Queue(maxsize=self.prefetch * self.num_workers)
+        stop = threading.Event()
+        workers = [
+            threading.Thread(
+                target=self._producer,
+                args=(entries[w::self.num_workers], out_q, stop),
+                daemon=True,
+            )
+            for w in range(self.num_workers)
+        ]
+        for t in workers:
+            t.start()
+
+        buffer = []
+        finished = 0
+
+        try:
+            while finished < len(workers):
+                shard = out_q.get()
+                if shard is None:
+                    finished += 1
+                    continue
+
+                for sample in self._shard_samples(shard):
+                    if self.shuffle_buffer <= 1:
+                        yield sample
+                        continue
+                    if len(buffer) < self.shuffle_buffer:
+                        buffer.append(sample)
+                        continue
+                    j = rng.randrange(len(buffer))
+                    buffer[j], sample = sample, buffer[j]
+                    yield sample
+
+            rng.shuffle(buffer)
+            yield from buffer
+        finally:
+            stop.set()
+            # Unblock producers waiting on a full queue
+            while any(t.is_alive() for t in workers):
+                try:
+                    out_q.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export episodes to training shards")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--episodes", default=EPISODES_DIR)
+    p_export.add_argument("--out", default=SHARDS_DIR)
+    p_export.add_argument("--samples-per-shard", type=int, default=SAMPLES_PER_SHARD)
+
+    p_inspect = sub.add_parser("inspect")
+    p_inspect.add_argument("--out", default=SHARDS_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export":
+        export(args.episodes, args.out, args.samples_per_shard)
+
+    elif args.cmd == "inspect":
+        stream = ShardStream(args.out, shuffle_buffer=1, shuffle_shards=False)
+        print(json.dumps({k: v for k, v in stream.manifest.items() if k != "shards"}, indent=2))
+        for frame, pose, action, objects in stream:
+            print(frame.shape, pose.tolist(), action, objects)
+            break
+
+
+if __name__ == "__main__":
+    main()
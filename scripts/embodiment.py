@@ -1,6 +1,12 @@
-import habitat_sim
 import numpy as np
-from habitat_sim.utils.common import quat_from_angle_axis
+
+try:
+    import habitat_sim
+except ImportError:
+    habitat_sim = None
+
+from scripts.quaternion import quat_from_angle_axis
+from scripts.gridworld import GridworldConfig, GridworldSim, is_gridworld
 
 # -------------------------
 # Tunable constants
@@ -9,9 +15,26 @@ CAMERA_HEIGHT = 0.8        # realistic torso camera height
 MIN_BRIGHTNESS = 2.0      # was 8.0 (too aggressive)
 MIN_STD = 2.0             # was 6.0 (too aggressive)
 MAX_SPAWN_TRIES = 80
+SENSOR_RESOLUTION = [512, 512]
+SENSOR_HFOV = 90.0
+PANORAMA_RESOLUTION = [512, 1024]   # equirectangular, 2:1
+LOW_RES = 128                       # control / quality-check sensor size
+
+
+def make_sim_config(scene_path, depth=False, num_agents=1, panorama=False, low_res=None):
+    # Procedural scenes ("gridworld_<seed>") need no assets or habitat install
+    if is_gridworld(scene_path):
+        return GridworldConfig(
+            scene_path, SENSOR_RESOLUTION, SENSOR_HFOV, CAMERA_HEIGHT,
+            depth=depth, num_agents=num_agents, panorama=panorama,
+            panorama_resolution=PANORAMA_RESOLUTION, low_res=low_res
+        )
+    if habitat_sim is None:
+        raise RuntimeError(
+            f"habitat_sim is not installed; cannot load {scene_path} "
+            "(use a gridworld_<seed> scene for the NumPy backend)"
+        )
 
-
-def make_sim(scene_path):
     sim_cfg = habitat_sim.SimulatorConfiguration()
     sim_cfg.scene_id = scene_path
     sim_cfg.enable_physics = False
@@ -19,18 +42,77 @@ def make_sim(scene_path):
     sensor = habitat_sim.CameraSensorSpec()
     sensor.uuid = "rgb"
     sensor.sensor_type = habitat_sim.SensorType.COLOR
-    sensor.resolution = [512, 512]
+    sensor.resolution = SENSOR_RESOLUTION
 
     # Camera is mounted relative to agent origin
     sensor.position = [0.0, CAMERA_HEIGHT, 0.0]
-    sensor.hfov = 90.0
-
-    agent_cfg = habitat_sim.AgentConfiguration()
-    agent_cfg.sensor_specifications = [sensor]
-
-    cfg = habitat_sim.Configuration(sim_cfg, [agent_cfg])
-    sim = habitat_sim.Simulator(cfg)
-    return sim
+    sensor.hfov = SENSOR_HFOV
+
+    sensors = [sensor]
+
+    # Optional depth camera, co-located with RGB for occupancy mapping
+    if depth:
+        depth_sensor = habitat_sim.CameraSensorSpec()
+        depth_sensor.uuid = "depth"
+        depth_sensor.sensor_type = habitat_sim.SensorType.DEPTH
+        depth_sensor.resolution = SENSOR_RESOLUTION
+        depth_sensor.position = [0.0, CAMERA_HEIGHT, 0.0]
+        depth_sensor.hfov = SENSOR_HFOV
+        sensors.append(depth_sensor)
+
+    # Optional cheap camera for per-step quality checks and control;
+    # the full-resolution "rgb" is then only rendered when needed
+    if low_res:
+        low_sensor = habitat_sim.CameraSensorSpec()
+        low_sensor.uuid = "rgb_low"
+        low_sensor.sensor_type = habitat_sim.SensorType.COLOR
+        low_sensor.resolution = [low_res, low_res]
+        low_sensor.position = [0.0, CAMERA_HEIGHT, 0.0]
+        low_sensor.hfov = SENSOR_HFOV
+        sensors.append(low_sensor)
+
+        # Matching depth, so low-res steps don't render full-res depth
+        if depth:
+            depth_low = habitat_sim.CameraSensorSpec()
+            depth_low.uuid = "depth_low"
+            depth_low.sensor_type = habitat_sim.SensorType.DEPTH
+            depth_low.resolution = [low_res, low_res]
+            depth_low.position = [0.0, CAMERA_HEIGHT, 0.0]
+            depth_low.hfov = SENSOR_HFOV
+            sensors.append(depth_low)
+
+    # Optional 360° equirectangular camera: a whole look-around in one render
+    if panorama:
+        pano_sensor = habitat_sim.EquirectangularSensorSpec()
+        pano_sensor.uuid = "panorama"
+        pano_sensor.sensor_type = habitat_sim.SensorType.COLOR
+        pano_sensor.resolution = PANORAMA_RESOLUTION
+        pano_sensor.position = [0.0, CAMERA_HEIGHT, 0.0]
+        sensors.append(pano_sensor)
+
+    # Every agent carries its own copy of the sensor stack; sensor uuids
+    # only need to be unique per agent.
+    agent_cfgs = []
+    for _ in range(num_agents):
+        agent_cfg = habitat_sim.AgentConfiguration()
+        agent_cfg.sensor_specifications = sensors
+        agent_cfgs.append(agent_cfg)
+
+    return habitat_sim.Configuration(sim_cfg, agent_cfgs)
+
+
+def make_sim(scene_path, depth=False, num_agents=1, panorama=False, low_res=None):
+    cfg = make_sim_config(
+        scene_path, depth=depth, num_agents=num_agents, panorama=panorama, low_res=low_res
+    )
+    return create_sim(cfg)
+
+
+def create_sim(cfg):
+    """Simulator for a config from make_sim_config (habitat or gridworld)."""
+    if isinstance(cfg, GridworldConfig):
+        return GridworldSim(cfg)
+    return habitat_sim.Simulator(cfg)
 
 
 def _random_yaw():
@@ -56,22 +138,25 @@ def _is_bad_frame(img):
     return False
 
 
-def find_valid_spawn(sim):
-    agent = sim.get_agent(0)
+def find_valid_spawn(sim, agent_id=0):
+    agent = sim.get_agent(agent_id)
     pf = sim.pathfinder
 
     for i in range(MAX_SPAWN_TRIES):
         pos = pf.get_random_navigable_point()
 
         # DO NOT add camera height here
-        state = habitat_sim.AgentState()
+        state = agent.get_state()
         state.position = np.array([pos[0], pos[1], pos[2]], dtype=np.float32)
         state.rotation = _random_yaw()
 
         agent.set_state(state)
 
-        obs = sim.get_sensor_observations()
-        rgb = obs.get("rgb")
+        if agent_id == 0:
+            uuid = quality_sensor(sim)
+            rgb = render_sensors(sim, [uuid])[uuid]
+        else:
+            rgb = sim.get_sensor_observations(agent_id).get("rgb")
 
         if not _is_bad_frame(rgb):
             print(f"Spawn accepted after {i + 1} tries")
@@ -80,16 +165,16 @@ def find_valid_spawn(sim):
     raise RuntimeError("Failed to find a valid spawn after multiple attempts")
 
 
-def reset_agent(sim, position=None):
-    agent = sim.get_agent(0)
+def reset_agent(sim, position=None, agent_id=0):
+    agent = sim.get_agent(agent_id)
 
     if position is None:
-        state = find_valid_spawn(sim)
+        state = find_valid_spawn(sim, agent_id)
         agent.set_state(state)
         return agent
 
     # Manual placement path
-    state = habitat_sim.AgentState()
+    state = agent.get_state()
     state.position = np.array(position, dtype=np.float32)
     state.rotation = _random_yaw()
 
@@ -97,9 +182,34 @@ def reset_agent(sim, position=None):
     return agent
 
 
-def capture_frame(sim):
-    obs = sim.get_sensor_observations()
-    rgb = obs.get("rgb")
+def render_sensors(sim, uuids):
+    """
+    Render only the listed sensors of agent 0.
+
+    get_sensor_observations() draws every sensor on the agent, so with
+    extra (panorama, high-res) sensors attached we draw just the ones a
+    step actually needs.
+    """
+    sensors = getattr(sim, "_sensors", None)
+    if sensors is None or any(u not in sensors for u in uuids):
+        obs = sim.get_sensor_observations()
+        return {u: obs.get(u) for u in uuids}
+
+    for u in uuids:
+        sensors[u].draw_observation()
+    return {u: sensors[u].get_observation() for u in uuids}
+
+
+def quality_sensor(sim):
+    """Cheapest sensor that is good enough for _is_bad_frame."""
+    sensors = getattr(sim, "_sensors", None) or {}
+    return "rgb_low" if "rgb_low" in sensors else "rgb"
+
+
+def capture_frame(sim, obs=None, uuid="rgb"):
+    if obs is None:
+        obs = sim.get_sensor_observations()
+    rgb = obs.get(uuid)
 
     if _is_bad_frame(rgb):
         return None
@@ -107,6 +217,13 @@ def capture_frame(sim):
     return rgb
 
 
+def capture_depth(obs, uuid="depth"):
+    depth = obs.get(uuid)
+    if depth is None:
+        return None
+    return np.asarray(depth, dtype=np.float32)
+
+
 def get_pose(agent):
     state = agent.get_state()
     q = state.rotation
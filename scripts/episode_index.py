@@ -0,0 +1,356 @@
+'''
+python -m scripts.episode_index ingest
+python -m scripts.episode_index object toilet --scene apartment_1.glb
+python -m scripts.episode_index near 1.2 0.0 -3.4 --radius 1.0
+python -m scripts.episode_index stats
+'''
+import os
+import json
+import sqlite3
+import argparse
+
+EPISODES_DIR = "outputs/episodes"
+INDEX_PATH = "outputs/episode_index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    episode_id     TEXT PRIMARY KEY,
+    path           TEXT NOT NULL,
+    scene          TEXT,
+    question       TEXT,
+    pattern        TEXT,
+    num_frames     INTEGER,
+    final_scene    TEXT,
+    mtime          REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS views (
+    episode_id     TEXT NOT NULL,
+    view_id        TEXT NOT NULL,
+    step           INTEGER NOT NULL,
+    action         TEXT,
+    x              REAL,
+    y              REAL,
+    z              REAL,
+    qw             REAL,
+    qx             REAL,
+    qy             REAL,
+    qz             REAL,
+    frame_path     TEXT,
+    PRIMARY KEY (episode_id, view_id)
+);
+
+CREATE TABLE IF NOT EXISTS objects (
+    episode_id     TEXT NOT NULL,
+    view_id        TEXT,
+    name           TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scene_types (
+    episode_id     TEXT NOT NULL,
+    view_id        TEXT,
+    scene_type     TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_episodes_scene ON episodes(scene);
+CREATE INDEX IF NOT EXISTS idx_views_xz ON views(x, z);
+CREATE INDEX IF NOT EXISTS idx_views_action ON views(action);
+CREATE INDEX IF NOT EXISTS idx_objects_name ON objects(name, episode_id);
+CREATE INDEX IF NOT EXISTS idx_objects_episode ON objects(episode_id);
+CREATE INDEX IF NOT EXISTS idx_scene_types_type ON scene_types(scene_type, episode_id);
+CREATE INDEX IF NOT EXISTS idx_scene_types_episode ON scene_types(episode_id);
+"""
+
+# Rows belonging to an episode, cleared before it is re-ingested
+CHILD_TABLES = ("views", "objects", "scene_types")
+
+
+def _episode_mtime(ep_path):
+    """Newest modification time of the files the index is built from."""
+    mtimes = []
+    for name in ("episode.json", "reasoning.json"):
+        p = os.path.join(ep_path, name)
+        if os.path.exists(p):
+            mtimes.append(os.path.getmtime(p))
+    return max(mtimes) if mtimes else None
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[INDEX] WARNING: could not read {path}: {e}")
+        return None
+
+
+class EpisodeIndex:
+    """
+    SQLite index over outputs/episodes/episode_XXXX.
+
+    Episodes are ingested incrementally: an episode is only re-parsed
+    when its episode.json / reasoning.json is newer than the indexed copy.
+    """
+
+    def __init__(self, db_path=INDEX_PATH):
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -------------------------
+    # Ingestion
+    # -------------------------
+    def ingest(self, base=EPISODES_DIR, force=False):
+        if not os.path.isdir(base):
+            print(f"[INDEX] No episode directory: {base}")
+            return {"added": 0, "updated": 0, "skipped": 0, "removed": 0}
+
+        # Keyed by directory name: meta["episode_id"] may differ from it
+        known = {
+            os.path.basename(row["path"]): (row["episode_id"], row["mtime"])
+            for row in self.conn.execute("SELECT episode_id, path, mtime FROM episodes")
+        }
+
+        stats = {"added": 0, "updated": 0, "skipped": 0, "removed": 0}
+        seen = set()
+
+        with self.conn:
+            for d in sorted(os.listdir(base)):
+                if not d.startswith("episode_"):
+                    continue
+                ep_path = os.path.join(base, d)
+                mtime = _episode_mtime(ep_path)
+                if mtime is None:
+                    continue
+                seen.add(d)
+
+                if not force and d in known and known[d][1] >= mtime:
+                    stats["skipped"] += 1
+                    continue
+
+                if self._ingest_episode(d, ep_path, mtime):
+                    stats["updated" if d in known else "added"] += 1
+
+            # Drop episodes whose directories were deleted
+            for d in set(known) - seen:
+                self._delete_episode(known[d][0])
+                stats["removed"] += 1
+
+        print(
+            f"[INDEX] added={stats['added']} updated={stats['updated']} "
+            f"skipped={stats['skipped']} removed={stats['removed']}"
+        )
+        return stats
+
+    def _delete_episode(self, ep_id):
+        for table in CHILD_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE episode_id = ?", (ep_id,))
+        self.conn.execute("DELETE FROM episodes WHERE episode_id = ?", (ep_id,))
+
+    def _ingest_episode(self, dir_name, ep_path, mtime):
+        data = _load_json(os.path.join(ep_path, "episode.json"))
+        if data is None:
+            return False
+
+        reasoning = _load_json(os.path.join(ep_path, "reasoning.json")) or {}
+        meta = data.get("meta", {})
+        traj = data.get("trajectory", [])
+        ep_id = meta.get("episode_id", dir_name)
+
+        self._delete_episode(ep_id)
+
+        self.conn.execute(
+            "INSERT INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                ep_id,
+                ep_path,
+                meta.get("scene"),
+                meta.get("question"),
+                meta.get("pattern"),
+                meta.get("num_frames", len(traj)),
+                reasoning.get("scene_type_guess"),
+                mtime,
+            ),
+        )
+
+        view_rows = []
+        object_rows = []
+        scene_rows = []
+
+        for i, step in enumerate(traj):
+            vid = step.get("id", f"{i:03d}")
+            pose = step.get("pose") or {}
+            pos = pose.get("position") or [None, None, None]
+            rot = pose.get("rotation") or [None, None, None, None]
+
+            view_rows.append((ep_id, vid, i, step.get("action"), *pos, *rot, step.get("frame_path")))
+
+            for obj in step.get("objects") or []:
+                object_rows.append((ep_id, vid, obj))
+            if step.get("scene_type"):
+                scene_rows.append((ep_id, vid, step["scene_type"]))
+
+        # Episode-level semantics from the final VLM result
+        for obj in reasoning.get("visible_objects") or []:
+            object_rows.append((ep_id, None, obj))
+        if reasoning.get("scene_type_guess"):
+            scene_rows.append((ep_id, None, reasoning["scene_type_guess"]))
+
+        self.conn.executemany(
+            "INSERT INTO views VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", view_rows
+        )
+        self.conn.executemany("INSERT INTO objects VALUES (?, ?, ?)", object_rows)
+        self.conn.executemany("INSERT INTO scene_types VALUES (?, ?, ?)", scene_rows)
+        return True
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def episodes_with_object(self, name, scene=None):
+        sql = (
+            "SELECT DISTINCT e.* FROM objects o "
+            "JOIN episodes e ON e.episode_id = o.episode_id "
+            "WHERE o.name = ?"
+        )
+        args = [name]
+        if scene is not None:
+            sql += " AND e.scene = ?"
+            args.append(scene)
+        sql += " ORDER BY e.episode_id"
+        return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def episodes_with_scene_type(self, scene_type, scene=None):
+        sql = (
+            "SELECT DISTINCT e.* FROM scene_types s "
+            "JOIN episodes e ON e.episode_id = s.episode_id "
+            "WHERE s.scene_type = ?"
+        )
+        args = [scene_type]
+        if scene is not None:
+            sql += " AND e.scene = ?"
+            args.append(scene)
+        sql += " ORDER BY e.episode_id"
+        return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def views_near(self, position, radius=1.0, scene=None):
+        """
+        All views within `radius` metres (ground plane, x/z) of `position`.
+        The bounding-box prefilter runs on the (x, z) index.
+        """
+        x, _, z = position
+        sql = (
+            "SELECT v.*, e.scene FROM views v "
+            "JOIN episodes e ON e.episode_id = v.episode_id "
+            "WHERE v.x BETWEEN ? AND ? AND v.z BETWEEN ? AND ? "
+            "AND ((v.x - ?) * (v.x - ?) + (v.z - ?) * (v.z - ?)) <= ?"
+        )
+        args = [x - radius, x + radius, z - radius, z + radius, x, x, z, z, radius * radius]
+        if scene is not None:
+            sql += " AND e.scene = ?"
+            args.append(scene)
+        sql += " ORDER BY v.episode_id, v.step"
+        return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def views_for_episode(self, ep_id):
+        return [
+            dict(r)
+            for r in self.conn.execute(
+                "SELECT * FROM views WHERE episode_id = ? ORDER BY step", (ep_id,)
+            )
+        ]
+
+    def stats(self):
+        def count(table):
+            return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+        return {
+            "episodes": count("episodes"),
+            "views": count("views"),
+            "objects": count("objects"),
+            "scene_types": count("scene_types"),
+            "scenes": [
+                dict(r)
+                for r in self.conn.execute(
+                    "SELECT scene, COUNT(*) AS episodes FROM episodes "
+                    "GROUP BY scene ORDER BY episodes DESC"
+                )
+            ],
+        }
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the episode archive index")
+    parser.add_argument("--db", default=INDEX_PATH)
+    parser.add_argument("--episodes", default=EPISODES_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Index new or modified episodes")
+    p_ingest.add_argument("--force", action="store_true")
+
+    p_obj = sub.add_parser("object", help="Episodes that saw an object")
+    p_obj.add_argument("name")
+    p_obj.add_argument("--scene")
+
+    p_scene = sub.add_parser("scene-type", help="Episodes with a scene type")
+    p_scene.add_argument("scene_type")
+    p_scene.add_argument("--scene")
+
+    p_near = sub.add_parser("near", help="Views near a position")
+    p_near.add_argument("x", type=float)
+    p_near.add_argument("y", type=float)
+    p_near.add_argument("z", type=float)
+    p_near.add_argument("--radius", type=float, default=1.0)
+    p_near.add_argument("--scene")
+
+    sub.add_parser("stats", help="Index summary")
+
+    args = parser.parse_args(argv)
+
+    with EpisodeIndex(args.db) as index:
+        if args.cmd == "ingest":
+            index.ingest(args.episodes, force=args.force)
+
+        elif args.cmd == "object":
+            for row in index.episodes_with_object(args.name, scene=args.scene):
+                print(f"{row['episode_id']}  {row['scene']}  {row['path']}")
+
+        elif args.cmd == "scene-type":
+            for row in index.episodes_with_scene_type(args.scene_type, scene=args.scene):
+                print(f"{row['episode_id']}  {row['scene']}  {row['path']}")
+
+        elif args.cmd == "near":
+            rows = index.views_near(
+                (args.x, args.y, args.z), radius=args.radius, scene=args.scene
+            )
+            for row in rows:
+                print(
+                    f"{row['episode_id']}/{row['view_id']}  {row['action']}  "
+                    f"[{row['x']:.2f}, {row['y']:.2f}, {row['z']:.2f}]  {row['frame_path']}"
+                )
+
+        elif args.cmd == "stats":
+            print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
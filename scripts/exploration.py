@@ -0,0 +1,275 @@
+# scripts/exploration.py
+
+import numpy as np
+
+from scripts.embodiment import SENSOR_HFOV
+from scripts.occupancy_map import quat_to_matrix, FREE, UNKNOWN
+
+# -------------------------
+# Tunable constants
+# -------------------------
+CELL_SIZE = 0.25          # coverage grid resolution (meters)
+VIEW_RANGE = 3.0          # how far a view counts as "seen" without depth
+MIN_TARGET_DIST = 1.0     # frontiers closer than this are considered reached
+MAX_STEP = 0.6            # forward distance per emitted move (matches fallback)
+TURN_QUANTUM = 30         # rotations are emitted in multiples of this
+TURN_COST = 0.5           # meters of travel one radian of turning is worth
+GEODESIC_CANDIDATES = 8   # nearest frontiers (straight-line) re-ranked by path length
+BLACKLIST_RADIUS = 0.75   # meters around a failed / unreachable target dropped from frontiers
+
+
+def forward_xz(rotation):
+    """Unit ground-plane heading of a [w, x, y, z] rotation."""
+    f = quat_to_matrix(rotation) @ np.array([0.0, 0.0, -1.0], dtype=np.float32)
+    v = np.array([f[0], f[2]], dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n > 1e-6 else np.array([0.0, -1.0], dtype=np.float32)
+
+
+def signed_yaw(from_xz, to_xz):
+    """Yaw (degrees, +left) that turns heading `from_xz` onto `to_xz`."""
+    cross = from_xz[1] * to_xz[0] - from_xz[0] * to_xz[1]
+    dot = from_xz[0] * to_xz[0] + from_xz[1] * to_xz[1]
+    return float(np.degrees(np.arctan2(cross, dot)))
+
+
+class FrontierPlanner:
+    """
+    Frontier-based exploration.
+
+    Explored area comes from the occupancy map when depth is available,
+    otherwise from the field-of-view wedge of every recorded pose, with
+    cells behind non-navigable ones (walls, furniture) left unexplored.
+    Frontiers are navigable explored cells bordering unexplored space;
+    the planner picks the cheapest one (geodesic distance via `navigator`
+    when given, plus turning) and follows the navmesh path toward it.
+    """
+
+    def __init__(self, pathfinder=None, occupancy=None, cell_size=CELL_SIZE,
+                 view_range=VIEW_RANGE, hfov=SENSOR_HFOV, navigator=None):
+        self.pathfinder = pathfinder
+        self.navigator = navigator
+        self.occupancy = occupancy
+        self.cell_size = cell_size
+        self.view_range = view_range
+        self.hfov = hfov
+
+        self.explored = set()      # (i, j) coverage cells
+        self.navigable = {}        # (i, j) -> bool, memoized pathfinder queries
+        self.blacklist = set()     # frontier cells we failed to reach
+        self.floor_y = 0.0
+        self.target = None
+        self.steps = 0
+        self.explored_navigable = 0
+
+        r = int(np.ceil(view_range / cell_size))
+        di, dj = np.mgrid[-r:r + 1, -r:r + 1]
+        self._offsets = np.stack([di.ravel(), dj.ravel()], axis=1)
+        self._offset_xz = self._offsets * cell_size
+        self._radius = r
+
+        # Cells each sight line from the agent's cell passes through on the
+        # way to an offset (padded with the agent's own cell, 0 / 0)
+        samples = 2 * r + 1
+        t = (np.arange(1, samples + 1) / (samples + 1))[None, :, None]
+        ray = np.rint(self._offsets[:, None, :] * t).astype(np.int64)
+        self._ray_cells = ray + r    # indices into a (2r+1)^2 window
+
+    def _window_navigable(self, base):
+        """(2r+1, 2r+1) navigability around `base` (memoized pathfinder queries)."""
+        r = self._radius
+        nav = np.empty((2 * r + 1, 2 * r + 1), dtype=bool)
+        for di in range(-r, r + 1):
+            for dj in range(-r, r + 1):
+                nav[di + r, dj + r] = self._is_navigable((base[0] + di, base[1] + dj))
+        # The agent's own cell can read as blocked right next to a wall
+        nav[r, r] = True
+        return nav
+
+    # ==========================================================
+    # Grid helpers
+    # ==========================================================
+    def _cell(self, xz):
+        return (int(np.floor(xz[0] / self.cell_size)), int(np.floor(xz[1] / self.cell_size)))
+
+    def _center(self, cell):
+        return np.array([(cell[0] + 0.5) * self.cell_size, (cell[1] + 0.5) * self.cell_size])
+
+    def _is_navigable(self, cell):
+        if self.pathfinder is None:
+            return True
+        if cell not in self.navigable:
+            x, z = self._center(cell)
+            self.navigable[cell] = bool(
+                self.pathfinder.is_navigable(np.array([x, self.floor_y, z], dtype=np.float32))
+            )
+        return self.navigable[cell]
+
+    # ==========================================================
+    # Coverage
+    # ==========================================================
+    def observe(self, pose, hfov=None):
+        """Mark the field of view of `pose` as explored (hfov=360 for panoramas)."""
+        pos = np.asarray(pose["position"], dtype=np.float32)
+        self.floor_y = float(pos[1])
+        xz = pos[[0, 2]]
+        heading = forward_xz(pose["rotation"])
+
+        # Wedge test on precomputed offsets around the agent's cell
+        base = self._cell(xz)
+        rel = self._offset_xz + (np.array(base) + 0.5) * self.cell_size - xz
+        dist = np.linalg.norm(rel, axis=1)
+        cos = (rel @ heading) / np.maximum(dist, 1e-6)
+        half = np.cos(np.deg2rad(min(hfov or self.hfov, 360.0) / 2.0))
+        mask = (dist <= self.view_range) & ((cos >= half) | (dist < self.cell_size))
+
+        # Occlusion: every cell on the sight line before the target must be
+        # open (the blocking cell itself is seen)
+        if self.pathfinder is not None:
+            nav = self._window_navigable(base)
+            rays = self._ray_cells[mask]
+            target = self._offsets[mask] + self._radius
+            on_path = (rays != target[:, None, :]).any(axis=2)
+            open_ = nav[rays[..., 0], rays[..., 1]] | ~on_path
+            visible = np.flatnonzero(mask)[open_.all(axis=1)]
+            mask = np.zeros_like(mask)
+            mask[visible] = True
+
+        for di, dj in self._offsets[mask]:
+            cell = (base[0] + int(di), base[1] + int(dj))
+            if cell in self.explored:
+                continue
+            self.explored.add(cell)
+            if self._is_navigable(cell):
+                self.explored_navigable += 1
+
+        self.steps += 1
+
+    def covered_area(self):
+        """Explored area (m^2). Uses the occupancy map's free space when present."""
+        if self.occupancy is not None and self.occupancy.origin is not None:
+            return self.occupancy.summary()["free_m2"]
+        return self.explored_navigable * self.cell_size * self.cell_size
+
+    # ==========================================================
+    # Frontiers
+    # ==========================================================
+    def _wedge_frontiers(self):
+        out = []
+        for (i, j) in self.explored:
+            if (i, j) in self.blacklist:
+                continue
+            if all(n in self.explored for n in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1))):
+                continue
+            if self._is_navigable((i, j)):
+                out.append(self._center((i, j)))
+        return out
+
+    def _occupancy_frontiers(self):
+        grid = self.occupancy.state_grid()
+        free = grid == FREE
+        unknown = np.pad(grid == UNKNOWN, 1, constant_values=True)
+        near_unknown = (
+            unknown[:-2, 1:-1] | unknown[2:, 1:-1] | unknown[1:-1, :-2] | unknown[1:-1, 2:]
+        )
+        cells = np.argwhere(free & near_unknown)
+        out = []
+        for ij in cells:
+            xz = self.occupancy.cell_to_world(ij)
+            c = self._cell(xz)
+            if c in self.blacklist or not self._is_navigable(c):
+                continue
+            out.append(xz)
+        return out
+
+    def frontiers(self):
+        if self.occupancy is not None and self.occupancy.origin is not None:
+            return self._occupancy_frontiers()
+        return self._wedge_frontiers()
+
+    def _point(self, xz):
+        return [float(xz[0]), self.floor_y, float(xz[1])]
+
+    def _select_target(self, xz, heading):
+        candidates = []
+        for f in self.frontiers():
+            d = f - xz
+            dist = float(np.linalg.norm(d))
+            if dist < MIN_TARGET_DIST:
+                continue
+            turn = abs(signed_yaw(heading, d / dist))
+            candidates.append((dist + TURN_COST * np.deg2rad(turn), dist, f))
+        candidates.sort(key=lambda c: c[0])
+
+        if self.navigator is None:
+            return candidates[0][2] if candidates else None
+
+        # Straight-line distance ignores walls: re-rank the nearest few by
+        # navmesh path length and drop the ones that can't be reached
+        best, best_cost = None, None
+        for cost, dist, f in candidates[:GEODESIC_CANDIDATES]:
+            geo = self.navigator.distance(self._point(xz), self._point(f))
+            if not np.isfinite(geo):
+                self._blacklist_around(f)
+                continue
+            cost += geo - dist
+            if best_cost is None or cost < best_cost:
+                best, best_cost = f, cost
+        return best
+
+    def _blacklist_around(self, xz):
+        r = int(np.ceil(BLACKLIST_RADIUS / self.cell_size))
+        ci, cj = self._cell(xz)
+        for di in range(-r, r + 1):
+            for dj in range(-r, r + 1):
+                if (di * di + dj * dj) * self.cell_size ** 2 <= BLACKLIST_RADIUS ** 2:
+                    self.blacklist.add((ci + di, cj + dj))
+
+    # ==========================================================
+    # Planning
+    # ==========================================================
+    def next_actions(self, pose):
+        """Symbolic actions (same schema as VLMReasoner) toward the current frontier."""
+        pos = np.asarray(pose["position"], dtype=np.float32)
+        xz = pos[[0, 2]]
+        heading = forward_xz(pose["rotation"])
+
+        if self.target is None or np.linalg.norm(self.target - xz) < MIN_TARGET_DIST:
+            self.target = self._select_target(xz, heading)
+
+        if self.target is None:
+            # Nothing left to explore from here: look around
+            return [{"action": "rotate", "angle_deg": 90}]
+
+        # Follow the navmesh path: its first turn and move, replanned each call
+        if self.navigator is not None:
+            plan = self.navigator.plan_to_point(pose, self._point(self.target))
+            if plan:
+                n = next((i for i, a in enumerate(plan) if a["action"] == "move_forward"), len(plan) - 1)
+                return plan[:n + 1]
+
+        d = self.target - xz
+        dist = float(np.linalg.norm(d))
+        angle = signed_yaw(heading, d / dist)
+        angle = int(TURN_QUANTUM * round(angle / TURN_QUANTUM))
+
+        actions = []
+        if angle != 0:
+            actions.append({"action": "rotate", "angle_deg": angle})
+        actions.append({"action": "move_forward", "distance": min(MAX_STEP, dist)})
+        return actions
+
+    def report_blocked(self):
+        """Drop the area around the current target after a failed move so we pick another."""
+        if self.target is not None:
+            self._blacklist_around(self.target)
+            self.target = None
+
+    def stats(self):
+        area = self.covered_area()
+        return {
+            "steps": self.steps,
+            "covered_m2": area,
+            "covered_m2_per_step": area / self.steps if self.steps else 0.0,
+            "frontiers_blacklisted": len(self.blacklist),
+        }
@@ -0,0 +1,389 @@
+# scripts/frame_pipeline.py
+
+import time
+import queue
+import itertools
+import multiprocessing as mp
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from scripts.metrics import REGISTRY
+
+# -------------------------
+# Tunable constants
+# -------------------------
+SLOT_SHAPE = (512, 512, 4)   # one RGBA sensor frame per slot
+NUM_SLOTS = 16
+SLOT_WAIT_S = 0.5            # backpressure poll interval while all slots are in use
+REASON_TIMEOUT_S = 600.0     # first call also waits for the model to load
+CONTEXT_CACHE = 12           # frames the perception stage keeps for VLM windows
+PERCEPTION_MIN_PIXELS = 256 * 28 * 28   # QwenVLMBackend defaults in the perception stage
+PERCEPTION_MAX_PIXELS = 512 * 28 * 28
+JOIN_TIMEOUT_S = 10.0
+
+PIPELINE_WAIT = REGISTRY.histogram(
+    "esr_pipeline_backpressure_seconds", "Time the sim stage waited for a free frame slot"
+)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: children share the parent's resource tracker
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """
+    Fixed-size frame slots in one shared-memory block.
+
+    The creating process owns (and unlinks) the block; stages attach by
+    name and read a slot as a numpy view, so frames cross processes
+    without pickling or copying.
+    """
+
+    def __init__(self, num_slots=NUM_SLOTS, slot_shape=SLOT_SHAPE, name=None):
+        self.num_slots = num_slots
+        self.slot_shape = tuple(slot_shape)
+        self.slot_bytes = int(np.prod(self.slot_shape))
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=num_slots * self.slot_bytes)
+        else:
+            self.shm = _attach(name)
+
+        self.array = np.ndarray(
+            (num_slots,) + self.slot_shape, dtype=np.uint8, buffer=self.shm.buf
+        )
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def fits(self, frame):
+        return frame.ndim == 3 and all(a <= b for a, b in zip(frame.shape, self.slot_shape))
+
+    def write(self, slot, frame):
+        h, w, c = frame.shape
+        self.array[slot, :h, :w, :c] = frame
+        return frame.shape
+
+    def view(self, slot, shape):
+        h, w, c = shape
+        return self.array[slot, :h, :w, :c]
+
+    def close(self):
+        # Views must be dropped before the mapping can be closed
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# ==========================================================
+# Stage processes
+# ==========================================================
+def _writer_main(ring_name, num_slots, slot_shape, inbox, done):
+    """Encode frames to PNG straight from shared memory."""
+    from scripts.logging_utils import save_frame
+
+    ring = FrameRing(num_slots, slot_shape, name=ring_name)
+    try:
+        while True:
+            msg = inbox.get()
+            if msg is None:
+                break
+            slot, shape, path = msg
+            try:
+                save_frame(ring.view(slot, shape), path)
+            except Exception as e:
+                print(f"[PIPE] Writer failed on {path}:", e)
+            done.put(slot)
+    finally:
+        ring.close()
+
+
+def _perception_main(ring_name, num_slots, slot_shape, inbox, done, results, prompt):
+    """
+    Owns the VLM. Frames are converted to RGB images as they arrive (so
+    their slots free up immediately) and kept for upcoming VLM windows.
+    """
+    from PIL import Image
+    from scripts.vlm_reasoner import VLMReasoner
+
+    ring = FrameRing(num_slots, slot_shape, name=ring_name)
+    # Load in the background so incoming frames are consumed (and their
+    # slots freed) while the weights are still loading
+    reasoner = VLMReasoner(prompt=prompt, background=True)
+    cache = OrderedDict()    # view_id -> PIL image or file path
+
+    def remember(view_id, image):
+        cache[view_id] = image
+        cache.move_to_end(view_id)
+        while len(cache) > CONTEXT_CACHE:
+            cache.popitem(last=False)
+
+    try:
+        while True:
+            msg = inbox.get()
+            if msg is None:
+                break
+            kind = msg[0]
+
+            if kind == "frame":
+                _, slot, shape, view_id = msg
+                try:
+                    remember(view_id, Image.fromarray(np.ascontiguousarray(ring.view(slot, shape)[..., :3])))
+                finally:
+                    done.put(slot)
+
+            elif kind == "path":
+                _, view_id, path = msg
+                remember(view_id, path)
+
+            elif kind == "reset":
+                cache.clear()
+
+            elif kind == "max_pixels":
+                reasoner.backend.set_max_pixels(msg[1])
+
+            elif kind == "reason":
+                _, req_id, question, view_ids, memory_summary, exploration_plan, landmarks = msg
+                images = [cache[v] for v in view_ids if v in cache]
+                try:
+                    result = reasoner.reason(
+                        question=question,
+                        frame_paths=images,
+                        memory_summary=memory_summary,
+                        exploration_plan=exploration_plan,
+                        landmarks=landmarks
+                    )
+                except Exception as e:
+                    print("[PIPE] Perception failed:", e)
+                    result = reasoner._offline_reasoning(question, [], memory_summary)
+                # Images don't cross back; report which views were used
+                result["frames_used"] = [v for v in view_ids if v in cache]
+                results.put((req_id, result))
+    finally:
+        ring.close()
+
+
+# ==========================================================
+# Sim-side front end
+# ==========================================================
+class PerceptionBudget:
+    """
+    Sim-side stand-in for the perception stage's VLM backend, so the
+    memory governor can lower / restore its visual-token budget:
+    set_max_pixels() is forwarded to the perception process.
+    """
+
+    def __init__(self, pipeline, min_pixels=PERCEPTION_MIN_PIXELS, max_pixels=PERCEPTION_MAX_PIXELS):
+        self.pipeline = pipeline
+        self.min_pixels = min_pixels
+        self.max_pixels = max_pixels
+
+    def set_max_pixels(self, max_pixels):
+        self.max_pixels = max(int(max_pixels), self.min_pixels)
+        self.pipeline.perception_q.put(("max_pixels", self.max_pixels))
+
+
+class FramePipeline:
+    """
+    Splits an episode into three processes that run at their own rates:
+
+    sim (this process) -> publishes frames into the shared ring
+    writer             -> encodes PNGs from its slots
+    perception         -> turns frames into VLM inputs, answers reason()
+
+    A slot is reused only after every stage it was sent to has returned
+    it; when all slots are in flight, publish() blocks (backpressure)
+    instead of letting queues grow without bound.
+    """
+
+    def __init__(self, num_slots=NUM_SLOTS, slot_shape=SLOT_SHAPE, perception=True, prompt=None):
+        # CUDA can't be initialised in a forked child
+        ctx = mp.get_context("spawn")
+
+        self.ring = FrameRing(num_slots, slot_shape)
+        self.free = deque(range(num_slots))
+        self.refs = [0] * num_slots
+        self.done = ctx.Queue()
+        self.results = ctx.Queue()
+        self.req_ids = itertools.count()
+        self.stats_ = {
+            "published": 0, "inline": 0, "backpressure_waits": 0,
+            "backpressure_s": 0.0, "reason_calls": 0, "reason_s": 0.0,
+        }
+
+        args = (self.ring.name, num_slots, self.ring.slot_shape)
+
+        self.writer_q = ctx.Queue()
+        self.writer = ctx.Process(
+            target=_writer_main, args=args + (self.writer_q, self.done),
+            name="esr-writer", daemon=True
+        )
+
+        self.perception_q = None
+        self.perception = None
+        self.backend = None
+        if perception:
+            self.backend = PerceptionBudget(self)
+            self.perception_q = ctx.Queue()
+            self.perception = ctx.Process(
+                target=_perception_main,
+                args=args + (self.perception_q, self.done, self.results, prompt),
+                name="esr-perception", daemon=True
+            )
+
+        for proc in self._procs():
+            proc.start()
+        print(f"[PIPE] Started {', '.join(p.name for p in self._procs())} ({num_slots} slots)")
+
+    def _procs(self):
+        return [p for p in (self.writer, self.perception) if p is not None]
+
+    def _check_alive(self):
+        for proc in self._procs():
+            if not proc.is_alive():
+                raise RuntimeError(f"Pipeline stage {proc.name} exited (code {proc.exitcode})")
+
+    # ==========================================================
+    # Slots
+    # ==========================================================
+    def _reclaim(self, timeout=None):
+        """Return finished slots to the free list; blocks up to `timeout` for the first."""
+        try:
+            slot = self.done.get(timeout=timeout) if timeout else self.done.get_nowait()
+            while True:
+                self.refs[slot] -= 1
+                if self.refs[slot] == 0:
+                    self.free.append(slot)
+                slot = self.done.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _acquire(self):
+        self._reclaim()
+        if self.free:
+            return self.free.popleft()
+
+        self.stats_["backpressure_waits"] += 1
+        t0 = time.perf_counter()
+        while not self.free:
+            self._check_alive()
+            self._reclaim(timeout=SLOT_WAIT_S)
+        dt = time.perf_counter() - t0
+        self.stats_["backpressure_s"] += dt
+        PIPELINE_WAIT.observe(dt)
+        return self.free.popleft()
+
+    # ==========================================================
+    # Public API
+    # ==========================================================
+    def publish(self, frame, view_id, path=None):
+        """
+        Hand a frame to the stages: the writer saves it to `path` (if
+        given), perception keeps it for VLM windows. Frames larger than a
+        slot (panoramas) are saved inline and passed to perception by path.
+        """
+        if not self.ring.fits(frame):
+            self.stats_["inline"] += 1
+            if path is not None:
+                from scripts.logging_utils import save_frame
+                save_frame(frame, path)
+                if self.perception_q is not None:
+                    self.perception_q.put(("path", view_id, path))
+            return
+
+        targets = []
+        if path is not None:
+            targets.append(self.writer_q)
+        if self.perception_q is not None:
+            targets.append(self.perception_q)
+        if not targets:
+            return
+
+        slot = self._acquire()
+        shape = self.ring.write(slot, frame)
+        self.refs[slot] = len(targets)
+        self.stats_["published"] += 1
+
+        if path is not None:
+            self.writer_q.put((slot, shape, path))
+        if self.perception_q is not None:
+            self.perception_q.put(("frame", slot, shape, view_id))
+
+    def reason(self, question, view_ids, memory_summary, exploration_plan=None, landmarks=None):
+        """VLMReasoner.reason() over previously published views, run in the perception stage."""
+        if self.perception_q is None:
+            raise RuntimeError("Pipeline was started without a perception stage")
+
+        req_id = next(self.req_ids)
+        t0 = time.perf_counter()
+        self.perception_q.put(
+            ("reason", req_id, question, list(view_ids), memory_summary, exploration_plan, landmarks)
+        )
+
+        deadline = t0 + REASON_TIMEOUT_S
+        while True:
+            # Keep slots flowing while perception works
+            self._reclaim()
+            try:
+                rid, result = self.results.get(timeout=SLOT_WAIT_S)
+            except queue.Empty:
+                self._check_alive()
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"No perception result after {REASON_TIMEOUT_S:.0f}s")
+                continue
+            if rid == req_id:
+                break
+
+        self.stats_["reason_calls"] += 1
+        self.stats_["reason_s"] += time.perf_counter() - t0
+        return result
+
+    def new_episode(self):
+        """Drop perception context from the previous episode (view ids restart)."""
+        if self.perception_q is not None:
+            self.perception_q.put(("reset",))
+
+    def flush(self):
+        """Block until every published frame has been consumed (files are on disk)."""
+        while len(self.free) < self.ring.num_slots:
+            self._check_alive()
+            self._reclaim(timeout=SLOT_WAIT_S)
+
+    def close(self):
+        try:
+            self.flush()
+        except RuntimeError as e:
+            print("[PIPE]", e)
+
+        for q in (self.writer_q, self.perception_q):
+            if q is not None:
+                q.put(None)
+        for proc in self._procs():
+            proc.join(JOIN_TIMEOUT_S)
+            if proc.is_alive():
+                print(f"[PIPE] {proc.name} did not exit, terminating")
+                proc.terminate()
+                proc.join()
+
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        s = dict(self.stats_)
+        s["slots"] = self.ring.num_slots
+        s["free_slots"] = len(self.free)
+        return s
@@ -0,0 +1,677 @@
+# scripts/gridworld.py
+
+import os
+import json
+import heapq
+
+import numpy as np
+
+from scripts.quaternion import Quaternion, yaw_axes
+
+# -------------------------
+# Tunable constants
+# -------------------------
+GRIDWORLD_PREFIX = "gridworld_"   # scene names gridworld_<seed> select this backend
+CELL = 0.2                # meters per floor-plan cell
+PLAN_SIZE = (60, 60)      # cells (z, x) -> 12 m x 12 m
+WALL_T = 2                # wall thickness (cells); keeps 0.6 m moves from tunnelling
+MIN_ROOM = 12             # smallest room side (cells)
+DOOR_W = 5                # doorway width (cells)
+MAX_SPLIT_DEPTH = 4
+WALL_HEIGHT = 2.5
+RAY_STEP = 0.05           # ray-march step (meters along the view axis)
+MAX_RANGE = 12.0
+FOG = 9.0                 # distance (m) at which colors fade to ~37%
+FLOOR_TILE = 0.5
+BLOCK_DIST = 0.6          # perception reports "blocked" closer than this
+MAX_PLAN_TRIES = 20
+
+FREE, WALL, OBJECT = 0, 1, 2
+
+ROOM_COLORS = {
+    "bathroom": (170, 205, 225),
+    "kitchen": (225, 205, 150),
+    "bedroom": (190, 165, 200),
+    "living_room": (215, 180, 150),
+    "office": (165, 195, 165),
+    "hallway": (200, 200, 190),
+}
+
+ROOM_OBJECTS = {
+    "bathroom": ["toilet", "sink", "bathtub"],
+    "kitchen": ["refrigerator", "stove", "table"],
+    "bedroom": ["bed", "wardrobe", "nightstand"],
+    "living_room": ["sofa", "tv", "table"],
+    "office": ["desk", "chair", "bookshelf"],
+    "hallway": [],
+}
+
+# name -> (height m, RGB)
+OBJECT_STYLE = {
+    "toilet": (0.5, (245, 245, 245)),
+    "sink": (0.9, (230, 230, 235)),
+    "bathtub": (0.6, (250, 250, 250)),
+    "refrigerator": (1.8, (200, 205, 210)),
+    "stove": (0.9, (60, 60, 60)),
+    "table": (0.75, (140, 95, 55)),
+    "bed": (0.6, (90, 110, 170)),
+    "wardrobe": (2.0, (120, 80, 45)),
+    "nightstand": (0.55, (150, 110, 70)),
+    "sofa": (0.8, (160, 50, 50)),
+    "tv": (1.2, (25, 25, 30)),
+    "desk": (0.75, (110, 75, 45)),
+    "chair": (0.9, (50, 90, 60)),
+    "bookshelf": (1.9, (100, 60, 35)),
+}
+
+CEILING_COLOR = np.array([235, 235, 230], dtype=np.float32)
+
+
+def _pack(rgb):
+    """(..., 3) colors in 0..255 -> (...) uint32 RGBA pixels (one store per pixel)."""
+    px = np.empty(rgb.shape[:-1] + (4,), dtype=np.uint8)
+    px[..., :3] = rgb
+    px[..., 3] = 255
+    return px.view(np.uint32)[..., 0]
+
+
+def is_gridworld(scene_path):
+    return os.path.basename(str(scene_path)).startswith(GRIDWORLD_PREFIX)
+
+
+def scene_seed(scene_path):
+    name = os.path.splitext(os.path.basename(str(scene_path)))[0]
+    suffix = name[len(GRIDWORLD_PREFIX):]
+    return int(suffix) if suffix.isdigit() else sum(map(ord, suffix))
+
+
+# ==========================================================
+# Procedural floor plans
+# ==========================================================
+class FloorPlan:
+    """
+    Rooms from a recursive binary split of the plan, one doorway per
+    split wall, then per-room furniture blocks. Cells are FREE / WALL /
+    OBJECT; `room` and `obj` hold per-cell room / object indices (-1 none).
+    """
+
+    def __init__(self, seed, size=PLAN_SIZE):
+        for attempt in range(MAX_PLAN_TRIES):
+            rng = np.random.default_rng(seed * MAX_PLAN_TRIES + attempt)
+            if self._generate(rng, size):
+                return
+        raise RuntimeError(f"Could not generate a connected floor plan for seed {seed}")
+
+    def _generate(self, rng, size):
+        h, w = size
+        self.grid = np.full((h, w), WALL, dtype=np.uint8)
+        self.room = np.full((h, w), -1, dtype=np.int16)
+        self.obj = np.full((h, w), -1, dtype=np.int16)
+        self.door = np.zeros((h, w), dtype=bool)
+        self.rooms = []       # [{"type", "bounds": (z0, x0, z1, x1)}]
+        self.objects = []     # [{"name", "room", "height", "color"}]
+
+        self._split(rng, WALL_T, WALL_T, h - WALL_T, w - WALL_T, 0)
+        if not self._connected():
+            return False
+
+        self._assign_types(rng)
+        self._furnish(rng)
+
+        # Lookup tables for the renderer; index -1 (no room / object) hits the last row
+        self.room_colors = np.array([r["color"] for r in self.rooms] + [[128, 128, 128]], dtype=np.float32)
+        self.object_colors = np.array([o["color"] for o in self.objects] + [[0, 0, 0]], dtype=np.float32)
+        self.object_heights = np.array([o["height"] for o in self.objects] + [0.0], dtype=np.float32)
+
+        # Origin centers the plan on (0, 0)
+        self.origin = -np.array([w, h], dtype=np.float64) * CELL / 2.0   # (x, z)
+        self.navigable = self._erode(self.grid == FREE)
+        self.spawnable = self.navigable & (self.room != self.goal_room)
+        return bool(self.spawnable.any())
+
+    def _split(self, rng, z0, x0, z1, x1, depth):
+        hz, wx = z1 - z0, x1 - x0
+        can_z = hz >= 2 * MIN_ROOM + WALL_T
+        can_x = wx >= 2 * MIN_ROOM + WALL_T
+        stop = depth >= MAX_SPLIT_DEPTH or not (can_z or can_x) or (depth >= 2 and rng.random() < 0.3)
+
+        if stop:
+            idx = len(self.rooms)
+            self.rooms.append({"type": None, "bounds": (z0, x0, z1, x1)})
+            self.grid[z0:z1, x0:x1] = FREE
+            self.room[z0:z1, x0:x1] = idx
+            return
+
+        along_z = can_z and (not can_x or hz > wx or (hz == wx and rng.random() < 0.5))
+        lo, hi = (z0, z1) if along_z else (x0, x1)
+        s = int(rng.integers(lo + MIN_ROOM, hi - MIN_ROOM - WALL_T + 1))
+
+        if along_z:
+            self._split(rng, z0, x0, s, x1, depth + 1)
+            self._split(rng, s + WALL_T, x0, z1, x1, depth + 1)
+            side_a = self.grid[s - 1, x0:x1] == FREE
+            side_b = self.grid[s + WALL_T, x0:x1] == FREE
+        else:
+            self._split(rng, z0, x0, z1, s, depth + 1)
+            self._split(rng, z0, s + WALL_T, z1, x1, depth + 1)
+            side_a = self.grid[z0:z1, s - 1] == FREE
+            side_b = self.grid[z0:z1, s + WALL_T] == FREE
+
+        # Doorway where both sides open onto a room for DOOR_W cells
+        both = (side_a & side_b).astype(np.int32)
+        runs = np.convolve(both, np.ones(DOOR_W, dtype=np.int32), mode="valid")
+        starts = np.flatnonzero(runs == DOOR_W)
+        if len(starts) == 0:
+            return
+        d = int(rng.choice(starts))
+        if along_z:
+            cols = slice(x0 + d, x0 + d + DOOR_W)
+            self.grid[s:s + WALL_T, cols] = FREE
+            self.door[s:s + WALL_T, cols] = True
+        else:
+            rows = slice(z0 + d, z0 + d + DOOR_W)
+            self.grid[rows, s:s + WALL_T] = FREE
+            self.door[rows, s:s + WALL_T] = True
+
+    def _connected(self, free=None):
+        free = self.grid == FREE if free is None else free
+        seed = np.argwhere(free)
+        if len(seed) == 0:
+            return False
+        seen = np.zeros_like(free)
+        stack = [tuple(seed[0])]
+        seen[stack[0]] = True
+        h, w = free.shape
+        while stack:
+            z, x = stack.pop()
+            for dz, dx in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                n = (z + dz, x + dx)
+                if 0 <= n[0] < h and 0 <= n[1] < w and free[n] and not seen[n]:
+                    seen[n] = True
+                    stack.append(n)
+        return bool(seen[free].all())
+
+    def _assign_types(self, rng):
+        types = [t for t in ROOM_COLORS if t not in ("hallway", "bathroom")]
+        for r in self.rooms:
+            z0, x0, z1, x1 = r["bounds"]
+            long_side, short_side = max(z1 - z0, x1 - x0), min(z1 - z0, x1 - x0)
+            r["type"] = "hallway" if long_side >= 2.5 * short_side else str(rng.choice(types))
+
+        # Exactly one bathroom (the default episode goal), so steps-to-goal
+        # means something; spawns are kept out of it
+        candidates = [i for i, r in enumerate(self.rooms) if r["type"] != "hallway"] or list(range(len(self.rooms)))
+        self.goal_room = int(rng.choice(candidates))
+        self.rooms[self.goal_room]["type"] = "bathroom"
+
+        for r in self.rooms:
+            jitter = rng.integers(-12, 13, size=3)
+            r["color"] = np.clip(np.array(ROOM_COLORS[r["type"]]) + jitter, 0, 255).astype(np.float32)
+
+    def _furnish(self, rng):
+        # Keep doorways and their approaches clear
+        blocked = self._dilate(self.door, 3)
+
+        for ri, r in enumerate(self.rooms):
+            z0, x0, z1, x1 = r["bounds"]
+            names = list(ROOM_OBJECTS[r["type"]])
+            rng.shuffle(names)
+            for name in names[:int(rng.integers(1, len(names) + 1))] if names else []:
+                sz, sx = (int(v) for v in rng.integers(3, 6, size=2))
+                # Against a wall: one coordinate pinned to the room edge
+                if rng.random() < 0.5:
+                    z = z0 if rng.random() < 0.5 else z1 - sz
+                    x = int(rng.integers(x0, x1 - sx + 1))
+                else:
+                    x = x0 if rng.random() < 0.5 else x1 - sx
+                    z = int(rng.integers(z0, z1 - sz + 1))
+
+                area = (slice(z, z + sz), slice(x, x + sx))
+                if (self.grid[area] != FREE).any() or blocked[area].any():
+                    continue
+
+                self.grid[area] = OBJECT
+                if not self._connected(self._erode(self.grid == FREE)):
+                    self.grid[area] = FREE
+                    continue
+
+                height, color = OBJECT_STYLE[name]
+                self.obj[area] = len(self.objects)
+                self.objects.append({
+                    "name": name, "room": ri, "height": height,
+                    "color": np.array(color, dtype=np.float32),
+                })
+
+    @staticmethod
+    def _shift_all(mask, r, op):
+        # Outside the plan counts as not free / not marked
+        out = mask.copy()
+        p = np.pad(mask, r, constant_values=False)
+        h, w = mask.shape
+        for dz in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                out = op(out, p[r + dz:r + dz + h, r + dx:r + dx + w])
+        return out
+
+    def _erode(self, free, r=1):
+        """Navigable = free with clearance `r` cells (the agent's radius)."""
+        return self._shift_all(free, r, np.logical_and)
+
+    def _dilate(self, mask, r):
+        return self._shift_all(mask, r, np.logical_or)
+
+    # ==========================================================
+    # Coordinates
+    # ==========================================================
+    def cell_of(self, x, z):
+        """(row, col) integer arrays; out-of-plan cells map to -1."""
+        col = np.floor((np.asarray(x) - self.origin[0]) / CELL).astype(np.int64)
+        row = np.floor((np.asarray(z) - self.origin[1]) / CELL).astype(np.int64)
+        h, w = self.grid.shape
+        outside = (row < 0) | (row >= h) | (col < 0) | (col >= w)
+        return np.where(outside, -1, row), np.where(outside, -1, col)
+
+    def cell_center(self, row, col):
+        return (self.origin[0] + (col + 0.5) * CELL, self.origin[1] + (row + 0.5) * CELL)
+
+    def room_type_at(self, x, z):
+        row, col = self.cell_of(x, z)
+        if row < 0:
+            return None
+        ri = int(self.room[row, col])
+        return self.rooms[ri]["type"] if ri >= 0 else None
+
+
+# ==========================================================
+# habitat_sim-compatible pieces
+# ==========================================================
+class AgentState:
+    def __init__(self, position=None, rotation=None):
+        self.position = np.zeros(3, dtype=np.float32) if position is None else np.array(position, dtype=np.float32)
+        self.rotation = Quaternion() if rotation is None else rotation
+
+
+class Agent:
+    def __init__(self):
+        self.state = AgentState()
+
+    def get_state(self):
+        return AgentState(self.state.position.copy(), self.state.rotation)
+
+    def set_state(self, state, *args, **kwargs):
+        self.state = AgentState(state.position, state.rotation)
+
+
+class ShortestPath:
+    def __init__(self):
+        self.requested_start = None
+        self.requested_end = None
+        self.points = []
+        self.geodesic_distance = float("inf")
+
+
+class GridPathFinder:
+    """Navmesh stand-in over the plan's navigable cells (floor at y = 0)."""
+
+    MAX_Y_DELTA = 0.5
+
+    def __init__(self, plan, rng):
+        self.plan = plan
+        self.rng = rng
+        self._cells = np.argwhere(plan.navigable)
+        self._spawn_cells = np.argwhere(plan.spawnable)
+
+    def _nav_cell(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        if abs(p[1]) > self.MAX_Y_DELTA:
+            return None
+        row, col = self.plan.cell_of(p[0], p[2])
+        if row < 0 or not self.plan.navigable[row, col]:
+            return None
+        return int(row), int(col)
+
+    def is_navigable(self, p):
+        return self._nav_cell(p) is not None
+
+    def get_random_navigable_point(self):
+        # Only used for spawning: never inside the goal room
+        row, col = self._spawn_cells[self.rng.integers(len(self._spawn_cells))]
+        x, z = self.plan.cell_center(row, col)
+        jitter = self.rng.uniform(-0.4, 0.4, size=2) * CELL
+        return np.array([x + jitter[0], 0.0, z + jitter[1]], dtype=np.float32)
+
+    def snap_point(self, p):
+        p = np.asarray(p, dtype=np.float64)
+        if self._nav_cell(p) is not None:
+            return np.array([p[0], 0.0, p[2]], dtype=np.float32)
+        x, z = self.plan.cell_center(self._cells[:, 0], self._cells[:, 1])
+        i = int(np.argmin((x - p[0]) ** 2 + (z - p[2]) ** 2))
+        return np.array([x[i], 0.0, z[i]], dtype=np.float32)
+
+    def _clear(self, a, b):
+        """Straight segment a -> b (x, z) stays on navigable cells."""
+        n = int(np.ceil(np.hypot(b[0] - a[0], b[1] - a[1]) / (CELL / 2))) + 1
+        t = np.linspace(0.0, 1.0, n)
+        row, col = self.plan.cell_of(a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t)
+        return bool((row >= 0).all() and self.plan.navigable[row, col].all())
+
+    def find_path(self, path):
+        start = self._nav_cell(self.snap_point(path.requested_start))
+        end = self._nav_cell(self.snap_point(path.requested_end))
+        path.points, path.geodesic_distance = [], float("inf")
+        if start is None or end is None:
+            return False
+
+        # A* over 8-connected navigable cells
+        nav = self.plan.navigable
+        h, w = nav.shape
+        dist = {start: 0.0}
+        prev = {}
+        heap = [(0.0, start)]
+        while heap:
+            _, cur = heapq.heappop(heap)
+            if cur == end:
+                break
+            for dz in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    if not (dz or dx):
+                        continue
+                    n = (cur[0] + dz, cur[1] + dx)
+                    if not (0 <= n[0] < h and 0 <= n[1] < w and nav[n]):
+                        continue
+                    if dz and dx and not (nav[cur[0] + dz, cur[1]] and nav[cur[0], cur[1] + dx]):
+                        continue
+                    nd = dist[cur] + (1.4142 if dz and dx else 1.0)
+                    if nd < dist.get(n, np.inf):
+                        dist[n] = nd
+                        prev[n] = cur
+                        heapq.heappush(heap, (nd + np.hypot(n[0] - end[0], n[1] - end[1]), n))
+        if end not in dist:
+            return False
+
+        cells = [end]
+        while cells[-1] != start:
+            cells.append(prev[cells[-1]])
+        cells.reverse()
+
+        # String-pull: keep only waypoints needed for line of sight
+        s = np.asarray(path.requested_start, dtype=np.float64)
+        e = np.asarray(path.requested_end, dtype=np.float64)
+        raw = [(s[0], s[2])] + [self.plan.cell_center(r, c) for r, c in cells[1:-1]] + [(e[0], e[2])]
+        pts = [raw[0]]
+        i = 0
+        while i < len(raw) - 1:
+            j = len(raw) - 1
+            while j > i + 1 and not self._clear(raw[i], raw[j]):
+                j -= 1
+            pts.append(raw[j])
+            i = j
+
+        path.points = [np.array([x, 0.0, z], dtype=np.float32) for x, z in pts]
+        path.geodesic_distance = float(sum(
+            np.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(pts, pts[1:])
+        ))
+        return True
+
+
+# ==========================================================
+# Rendering
+# ==========================================================
+class _Sensor:
+    """uuid -> what to draw; mimics habitat's draw_observation / get_observation."""
+
+    def __init__(self, sim, agent_id, spec):
+        self.sim = sim
+        self.agent_id = agent_id
+        self.spec = spec
+        self.obs = None
+
+    def draw_observation(self):
+        self.obs = self.sim._render(self.agent_id, self.spec)
+
+    def get_observation(self):
+        return self.obs
+
+
+class GridworldConfig:
+    """Mirror of the sensor options make_sim_config() takes for habitat."""
+
+    def __init__(self, scene_path, resolution, hfov, camera_height, depth=False,
+                 num_agents=1, panorama=False, panorama_resolution=None, low_res=None):
+        self.scene_path = scene_path
+        self.seed = scene_seed(scene_path)
+        self.num_agents = num_agents
+        self.camera_height = camera_height
+
+        self.sensors = [{"uuid": "rgb", "kind": "color", "resolution": resolution, "hfov": hfov}]
+        if depth:
+            self.sensors.append({"uuid": "depth", "kind": "depth", "resolution": resolution, "hfov": hfov})
+        if low_res:
+            self.sensors.append({"uuid": "rgb_low", "kind": "color", "resolution": [low_res, low_res], "hfov": hfov})
+            if depth:
+                self.sensors.append(
+                    {"uuid": "depth_low", "kind": "depth", "resolution": [low_res, low_res], "hfov": hfov}
+                )
+        if panorama:
+            self.sensors.append({"uuid": "panorama", "kind": "equirect", "resolution": panorama_resolution})
+
+
+class GridworldSim:
+    """
+    Pure-NumPy simulator over procedural floor plans.
+
+    Implements the habitat_sim.Simulator subset this repo uses (agents
+    with get/set_state, pathfinder, get_sensor_observations, reset,
+    reconfigure, close). Frames come from a column ray-march of the plan
+    at a fixed step, composited as walls / furniture / floor / ceiling
+    with per-room colors, so a 512x512 RGBA frame costs milliseconds.
+    """
+
+    def __init__(self, cfg):
+        self.reconfigure(cfg)
+
+    def reconfigure(self, cfg):
+        self.config = cfg
+        self.plan = FloorPlan(cfg.seed)
+        self.rng = np.random.default_rng(cfg.seed)
+        self.pathfinder = GridPathFinder(self.plan, self.rng)
+        self.agents = [Agent() for _ in range(cfg.num_agents)]
+        self.visible = {}   # agent_id -> perception summary of its last color frame
+        self._sensors = {s["uuid"]: _Sensor(self, 0, s) for s in cfg.sensors}
+        self._view_cache = {}
+
+    def reset(self):
+        self.rng = np.random.default_rng(self.config.seed)
+        self.pathfinder.rng = self.rng
+        for agent in self.agents:
+            agent.set_state(AgentState())
+        self.visible = {}
+
+    def close(self):
+        self.plan = None
+        self._sensors = {}
+
+    def get_agent(self, agent_id=0):
+        return self.agents[agent_id]
+
+    def get_sensor_observations(self, agent_ids=0):
+        if isinstance(agent_ids, int):
+            return {s["uuid"]: self._render(agent_ids, s) for s in self.config.sensors}
+        return {a: self.get_sensor_observations(a) for a in agent_ids}
+
+    # -------------------------
+    # Ray-march renderer
+    # -------------------------
+    def _view_geometry(self, spec):
+        """Per-column ray directions (camera frame) and per-row elevation tangents."""
+        key = (spec["kind"], tuple(spec["resolution"]), spec.get("hfov"))
+        if key not in self._view_cache:
+            h, w = spec["resolution"]
+            if spec["kind"] == "equirect":
+                lon = ((np.arange(w) + 0.5) / w - 0.5) * 2.0 * np.pi
+                cols = np.stack([np.cos(lon), np.sin(lon)], axis=1)       # (forward, right)
+                lat = np.pi / 2.0 - (np.arange(h) + 0.5) / h * np.pi
+                rows = np.tan(np.clip(lat, -1.55, 1.55))
+            else:
+                f = (w / 2.0) / np.tan(np.radians(spec["hfov"]) / 2.0)
+                # Unnormalized: one unit along the optical axis, so the
+                # marched distance is z-depth (habitat's depth convention)
+                cols = np.stack([np.ones(w), (np.arange(w) + 0.5 - w / 2.0) / f], axis=1)
+                rows = (h / 2.0 - (np.arange(h) + 0.5)) / f
+            steps = (np.arange(int(MAX_RANGE / RAY_STEP)) + 0.5) * RAY_STEP
+            self._view_cache[key] = (cols, rows, steps)
+        return self._view_cache[key]
+
+    def _render(self, agent_id, spec):
+        plan = self.plan
+        state = self.agents[agent_id].get_state()
+        cam_h = self.config.camera_height
+        forward, right = yaw_axes(state.rotation)
+        cols, rows, steps = self._view_geometry(spec)
+
+        # World-plane direction per column, then march all columns at once
+        dirs = cols[:, :1] * forward + cols[:, 1:] * right                  # (W, 2)
+        px = state.position[0] + steps[:, None] * dirs[None, :, 0]         # (S, W)
+        pz = state.position[2] + steps[:, None] * dirs[None, :, 1]
+        r, c = plan.cell_of(px, pz)
+        code = np.where(r >= 0, plan.grid[r, c], WALL)
+
+        n, w = code.shape
+        cols_idx = np.arange(w)
+        is_wall = code == WALL
+        wall_hit = np.where(is_wall.any(axis=0), is_wall.argmax(axis=0), n - 1)
+        is_obj = code == OBJECT
+        obj_hit = np.where(is_obj.any(axis=0), is_obj.argmax(axis=0), n - 1)
+        has_obj = is_obj.any(axis=0) & (obj_hit < wall_hit)
+
+        wall_d = steps[wall_hit].astype(np.float32)
+        obj_d = steps[obj_hit].astype(np.float32)
+        obj_id = np.where(has_obj, plan.obj[r[obj_hit, cols_idx], c[obj_hit, cols_idx]], -1)
+        obj_top = plan.object_heights[obj_id] - cam_h
+
+        # Every surface covers a contiguous run of rows per column; rows
+        # are sorted by decreasing elevation, so the runs are searchsorted
+        neg_rows = -rows
+        h = len(rows)
+        ceil_end = np.searchsorted(neg_rows, -(WALL_HEIGHT - cam_h) / wall_d, side="left")
+        floor_start = np.searchsorted(neg_rows, cam_h / wall_d, side="right")
+        obj_start = np.searchsorted(neg_rows, -obj_top / obj_d, side="left")
+        obj_end = np.where(has_obj, np.searchsorted(neg_rows, cam_h / obj_d, side="right"), 0)
+        has_obj &= obj_end > obj_start
+
+        ridx = np.arange(h)[:, None]
+        on_obj = None
+        if has_obj.any():
+            on_obj = has_obj[None, :] & (ridx >= obj_start[None, :]) & (ridx < obj_end[None, :])
+
+        with np.errstate(divide="ignore"):
+            floor_d = np.where(rows < 0, cam_h / -rows, MAX_RANGE).astype(np.float32)
+            ceil_d = np.where(rows > 0, (WALL_HEIGHT - cam_h) / rows, MAX_RANGE).astype(np.float32)
+
+        if spec["kind"] == "depth":
+            depth = np.broadcast_to(wall_d[None, :], (h, w)).copy()
+            np.copyto(depth, np.broadcast_to(ceil_d[:, None], (h, w)), where=ridx < ceil_end[None, :])
+            np.copyto(depth, np.broadcast_to(floor_d[:, None], (h, w)), where=ridx >= floor_start[None, :])
+            if on_obj is not None:
+                np.copyto(depth, np.broadcast_to(obj_d[None, :], (h, w)), where=on_obj)
+            return np.minimum(depth, MAX_RANGE)
+
+        # Composited as packed RGBA words: one masked store per pixel per layer
+        img = np.empty((h, w), dtype=np.uint32)
+
+        # ---------- Walls (per column) ----------
+        prev = np.maximum(wall_hit - 1, 0)
+        pr, pc = r[prev, cols_idx], c[prev, cols_idx]
+        wall_room = np.where(pr >= 0, plan.room[pr, pc], -1)
+        if spec["uuid"] in ("rgb", "rgb_low", "panorama"):
+            self._note_visible(agent_id, r, c, wall_hit, obj_id, has_obj, wall_d, wall_room)
+        # Faces hit across x are darker, so corners read as edges
+        x_face = c[wall_hit, cols_idx] != pc
+        shade = np.where(x_face, 0.8, 1.0) * np.exp(-wall_d / FOG)
+        img[:] = _pack(plan.room_colors[wall_room] * shade[:, None])[None, :]
+
+        # ---------- Ceiling (per row) ----------
+        ceil_px = _pack(CEILING_COLOR[None, :] * np.exp(-ceil_d / FOG)[:, None])
+        np.copyto(img, ceil_px[:, None], where=ridx < ceil_end[None, :])
+
+        # ---------- Floor (per pixel, only rows that can show floor) ----------
+        lo = int(floor_start.min()) if w else h
+        if lo < h:
+            fd = floor_d[lo:, None]
+            fdirs = dirs.astype(np.float32)
+            fx = np.float32(state.position[0]) + fd * fdirs[None, :, 0]
+            fz = np.float32(state.position[2]) + fd * fdirs[None, :, 1]
+            fr, fc = plan.cell_of(fx, fz)
+            floor_room = np.where(fr >= 0, plan.room[fr, fc], -1)
+            tile = ((np.floor(fx / FLOOR_TILE) + np.floor(fz / FLOOR_TILE)) % 2) * 0.12 + 0.55
+            floor_px = _pack(plan.room_colors[floor_room] * (tile * np.exp(-fd / FOG))[..., None])
+            np.copyto(img[lo:], floor_px, where=ridx[lo:] >= floor_start[None, :])
+
+        # ---------- Furniture (per column) ----------
+        if on_obj is not None:
+            obj_rgb = plan.object_colors[obj_id] * np.exp(-obj_d / FOG)[:, None]
+            np.copyto(img, _pack(obj_rgb)[None, :], where=on_obj)
+            # Darker band along the top edge so objects read against walls
+            band_end = np.searchsorted(neg_rows, -(obj_top - 0.05) / obj_d, side="left")
+            band = on_obj & (ridx < band_end[None, :])
+            np.copyto(img, _pack(obj_rgb * 0.7)[None, :], where=band)
+
+        return img.view(np.uint8).reshape(h, w, 4)
+
+    def _note_visible(self, agent_id, r, c, wall_hit, obj_id, has_obj, wall_d, wall_room):
+        """What a color frame shows: objects, doorways, and the room whose walls fill most columns."""
+        objects = sorted({self.plan.objects[i]["name"] for i in set(obj_id[has_obj].tolist())})
+
+        before_wall = np.arange(r.shape[0])[:, None] < wall_hit[None, :]
+        door_seen = bool((self.plan.door[r, c] & (r >= 0) & before_wall).any())
+
+        rooms = wall_room[wall_room >= 0]
+        room = self.plan.rooms[int(np.bincount(rooms).argmax())]["type"] if len(rooms) else None
+
+        self.visible[agent_id] = {
+            "objects": objects,
+            "door": door_seen,
+            "center_dist": float(wall_d[len(wall_d) // 2]),
+            "room": room,
+        }
+
+
+class GridworldPerception:
+    """
+    Ground-truth perception backend for gridworld sims.
+
+    Answers the VLM perception prompt with JSON built from what the last
+    color frame of agent 0 actually showed, so VLMReasoner's parsing,
+    scene abstraction and action rules run unchanged without a model.
+    """
+
+    def __init__(self, sim, agent_id=0):
+        self.sim = sim
+        self.agent_id = agent_id
+
+    def _perceive(self):
+        seen = self.sim.visible.get(self.agent_id)
+        if seen is None:
+            return {}
+
+        affordances = []
+        if seen["door"]:
+            affordances.append("door")
+        if seen["room"] == "hallway":
+            affordances.append("corridor")
+        if seen["center_dist"] < BLOCK_DIST:
+            affordances.append("blocked")
+        if not affordances:
+            affordances.append("open_space")
+
+        return {
+            "objects": {name: {} for name in seen["objects"]},
+            "scene": {"room": {"type": seen["room"] or "unknown"}},
+            "navigational_affordances": affordances,
+        }
+
+    def run(self, prompt, frame_paths):
+        return json.dumps(self._perceive())
+
+    def run_batch(self, prompt, frame_path_lists):
+        return [self.run(prompt, paths) for paths in frame_path_lists]
@@ -1,7 +1,21 @@
 import os
 import json
+import time
 from PIL import Image
 
+from scripts.metrics import FRAMES_SAVED, FRAME_SAVE_SECONDS
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+VIDEO_FPS = 5
+# Tried in order; avc1 plays in browsers but is missing from some OpenCV builds
+VIDEO_CODECS = ("avc1", "mp4v")
+VIDEO_FILE = "frames.mp4"
+VIDEO_INDEX_FILE = "frames_index.json"
+
 def make_episode_dir(base="outputs/episodes"):
     os.makedirs(base, exist_ok=True)
     existing = sorted(d for d in os.listdir(base) if d.startswith("episode_"))
@@ -12,8 +26,108 @@ def make_episode_dir(base="outputs/episodes"):
     return ep_id, path
 
 def save_frame(img, path):
+    t0 = time.perf_counter()
     Image.fromarray(img).save(path)
+    FRAME_SAVE_SECONDS.observe(time.perf_counter() - t0)
+    FRAMES_SAVED.inc()
 
 def save_episode_json(path, data):
     with open(path, "w") as f:
         json.dump(data, f, indent=2)
+
+
+class VideoFrameWriter:
+    """
+    Encodes an episode's frame stream into a single video file.
+
+    A sidecar (frames_index.json) maps view ids to video frame indices
+    so individual steps can be looked up without decoding the whole file.
+    """
+
+    def __init__(self, ep_path, fps=VIDEO_FPS):
+        if cv2 is None:
+            raise RuntimeError("Video frame mode requires OpenCV (pip install opencv-python)")
+
+        self.path = os.path.join(ep_path, VIDEO_FILE)
+        self.index_path = os.path.join(ep_path, VIDEO_INDEX_FILE)
+        self.fps = fps
+        self.writer = None
+        self.codec = None
+        self.size = None
+        self.frames = {}
+
+    def _open(self, width, height):
+        for codec in VIDEO_CODECS:
+            writer = cv2.VideoWriter(
+                self.path, cv2.VideoWriter_fourcc(*codec), self.fps, (width, height)
+            )
+            if writer.isOpened():
+                self.writer = writer
+                self.codec = codec
+                self.size = (width, height)
+                return
+            writer.release()
+        raise RuntimeError(f"No usable video codec among {VIDEO_CODECS}")
+
+    def write(self, img, view_id):
+        h, w = img.shape[:2]
+        if self.writer is None:
+            self._open(w, h)
+        elif (w, h) != self.size:
+            raise ValueError(f"Frame size {(w, h)} does not match video size {self.size}")
+
+        if img.ndim == 3 and img.shape[2] == 4:
+            bgr = cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+        else:
+            bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+        idx = len(self.frames)
+        t0 = time.perf_counter()
+        self.writer.write(bgr)
+        FRAME_SAVE_SECONDS.observe(time.perf_counter() - t0)
+        FRAMES_SAVED.inc()
+        self.frames[view_id] = idx
+        return idx
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+        save_episode_json(self.index_path, {
+            "video": VIDEO_FILE,
+            "codec": self.codec,
+            "fps": self.fps,
+            "num_frames": len(self.frames),
+            "frames": self.frames,
+        })
+
+
+class VideoFrameReader:
+    """
+    Random access into an episode video by frame index.
+    Consecutive reads decode sequentially; only jumps trigger a seek.
+    """
+
+    def __init__(self, path):
+        if cv2 is None:
+            raise RuntimeError("Reading video frames requires OpenCV (pip install opencv-python)")
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video: {path}")
+        self.next_index = 0
+
+    def read(self, index):
+        if index != self.next_index:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+
+        ok, bgr = self.cap.read()
+        if not ok:
+            self.next_index = -1
+            return None
+
+        self.next_index = index + 1
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self.cap.release()
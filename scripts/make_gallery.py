@@ -22,7 +22,7 @@ body {{
   align-items: center;
 }}
 
-#main-img {{
+#main-img, #main-png {{
   max-width: 90vw;
   max-height: 70vh;
   border: 2px solid #333;
@@ -85,7 +85,7 @@ button:hover {{
 <p>Scene: {scene} | Frames: {num_frames}</p>
 
 <div id="viewer">
-  <img id="main-img" src="frames/000.png">
+  {main_media}
   <div id="info"></div>
 
   <div id="controls">
@@ -106,14 +106,14 @@ button:hover {{
 const frames = {frame_data};
 
 let current = 0;
-const img = document.getElementById("main-img");
+const media = document.getElementById("main-img");
 const info = document.getElementById("info");
 const slider = document.getElementById("slider");
 
 function updateFrame(i) {{
   current = parseInt(i);
   const f = frames[current];
-  img.src = "frames/" + f.filename;
+  showFrame(f);
   info.innerHTML =
     "<b>#" + current + "</b> | " +
     "action: " + f.action + "<br>" +
@@ -121,6 +121,8 @@ function updateFrame(i) {{
   slider.value = current;
 }}
 
+{show_frame_js}
+
 function prevFrame() {{
   if (current > 0) updateFrame(current - 1);
 }}
@@ -143,6 +145,46 @@ updateFrame(0);
 """
 
 
+IMAGE_MEDIA = '<img id="main-img" src="frames/000.png">'
+
+IMAGE_SHOW_JS = """function showFrame(f) {{
+  if (f.filename === null) return;
+  media.src = "frames/" + f.filename;
+}}"""
+
+VIDEO_MEDIA = (
+    '<video id="main-img" src="{video}" preload="auto" muted playsinline></video>'
+    '<img id="main-png" style="display: none">'
+)
+
+# Seek to the middle of the frame's display interval so rounding never
+# lands on the neighbouring frame. Steps saved as PNGs (panoramas) are
+# not in the video and are shown as images instead.
+VIDEO_SHOW_JS = """const FPS = {fps};
+const still = document.getElementById("main-png");
+function showFrame(f) {{
+  media.pause();
+  if (f.video_index === null) {{
+    if (f.filename === null) return;
+    media.style.display = "none";
+    still.style.display = "";
+    still.src = "frames/" + f.filename;
+    return;
+  }}
+  still.style.display = "none";
+  media.style.display = "";
+  media.currentTime = (f.video_index + 0.5) / FPS;
+}}"""
+
+
+def _load_video_index(episode_dir):
+    path = os.path.join(episode_dir, "frames_index.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
 def main(episode_dir):
     frames_dir = os.path.join(episode_dir, "frames")
     episode_json = os.path.join(episode_dir, "episode.json")
@@ -160,12 +202,16 @@ def main(episode_dir):
 
     meta = data.get("meta", {})
     traj = data.get("trajectory", [])
+    video_index = _load_video_index(episode_dir)
 
     frame_data = []
     grid_cards = []
 
     for i, step in enumerate(traj):
-        img_name = f"{i:03d}.png"
+        # Steps without a stored frame (rejected or control-only) keep the
+        # pose only; in video episodes only panoramas are PNG files
+        has_png = step.get("frame_path") is not None and step.get("frame_index") is None
+        img_name = f"{i:03d}.png" if has_png else None
         img_path = f"frames/{img_name}"
 
         action = step.get("action", "unknown")
@@ -173,13 +219,15 @@ def main(episode_dir):
 
         frame_data.append({
             "filename": img_name,
+            "video_index": step.get("frame_index"),
             "action": action,
             "position": pos,
         })
 
+        thumb = f'<img src="{img_path}">' if has_png else ""
         card = f"""
         <div class="thumb" onclick="updateFrame({i})">
-            <img src="{img_path}">
+            {thumb}
             <div class="meta">
                 #{i} | {action}
             </div>
@@ -187,7 +235,16 @@ def main(episode_dir):
         """
         grid_cards.append(card)
 
+    if video_index:
+        main_media = VIDEO_MEDIA.format(video=video_index["video"])
+        show_frame_js = VIDEO_SHOW_JS.format(fps=video_index["fps"])
+    else:
+        main_media = IMAGE_MEDIA
+        show_frame_js = IMAGE_SHOW_JS.format()
+
     html = HTML_TEMPLATE.format(
+        main_media=main_media,
+        show_frame_js=show_frame_js,
         episode_id=meta.get("episode_id", "unknown"),
         scene=meta.get("scene", "unknown"),
         num_frames=len(traj),
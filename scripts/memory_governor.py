@@ -0,0 +1,199 @@
+# scripts/memory_governor.py
+
+import gc
+import time
+
+from scripts.metrics import REGISTRY, process_rss_bytes
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# -------------------------
+# Tunable constants
+# -------------------------
+SOFT_RATIO = 0.80         # start trimming the VLM / context budgets
+HARD_RATIO = 0.92         # also drop in-memory frames and cached allocations
+RECOVER_RATIO = 0.60      # below this, budgets are restored one notch at a time
+MIN_MAX_PIXELS = 256 * 28 * 28   # QwenVLMBackend min_pixels: the lowest budget it applies
+MIN_CONTEXT_FRAMES = 2
+KEEP_RECENT_FRAMES = 12   # in-memory frames never evicted (VLM context)
+ADMIT_POLL_S = 2.0
+ADMIT_TIMEOUT_S = 60.0    # give up on a new episode if memory doesn't come back
+ADJUST_COOLDOWN_S = 10.0  # min time between budget changes, so one spike != many halvings
+
+OK, SOFT, HARD, CRITICAL = "ok", "soft", "hard", "critical"
+LEVEL_VALUE = {OK: 0, SOFT: 1, HARD: 2, CRITICAL: 3}
+
+GOV_LEVEL = REGISTRY.gauge("esr_governor_level", "Memory pressure level (0 ok .. 3 critical)")
+GOV_ACTIONS = REGISTRY.counter("esr_governor_actions", "Memory governor decisions", ["action"])
+
+
+def accelerator_memory():
+    """(used_bytes, total_bytes) for the current CUDA device, or None."""
+    if torch is None or not torch.cuda.is_available():
+        return None
+    try:
+        free, total = torch.cuda.mem_get_info()
+    except RuntimeError:
+        return None
+    return total - free, total
+
+
+class MemoryGovernor:
+    """
+    Watches process RSS and CUDA memory against budgets and degrades
+    gracefully instead of getting OOM-killed. Only resources with a
+    budget are tracked; with neither set the governor never acts.
+
+    soft     -> halve the VLM visual-token budget, shrink context frames
+    hard     -> also evict persisted in-memory frames, free caches
+    critical -> over budget: new episodes wait until memory drops
+
+    Budgets are restored step by step once usage falls below RECOVER_RATIO.
+    Every decision is printed and kept in `self.log`.
+    """
+
+    def __init__(self, rss_budget_bytes=None, accel_budget_bytes=None):
+        self.rss_budget = rss_budget_bytes
+        self.accel_budget = accel_budget_bytes
+        self.level = OK
+        self.context_scale = 1.0
+        self.base_max_pixels = None
+        self.last_adjust = 0.0
+        self.log = []
+
+    # ==========================================================
+    # Measurement
+    # ==========================================================
+    def usage(self):
+        """Highest usage / budget ratio across the tracked resources."""
+        ratios = {}
+
+        rss = process_rss_bytes()
+        if self.rss_budget and rss is not None:
+            ratios["rss"] = rss / self.rss_budget
+
+        accel = accelerator_memory() if self.accel_budget else None
+        if accel is not None:
+            used, _ = accel
+            ratios["accel"] = used / self.accel_budget
+
+        return ratios
+
+    def _decide(self, action, detail, ratio):
+        entry = {"t": time.time(), "level": self.level, "action": action,
+                 "detail": detail, "usage": round(ratio, 3)}
+        self.log.append(entry)
+        GOV_ACTIONS.labels(action=action).inc()
+        print(f"[GOV] {self.level}: {action} ({detail}) usage={ratio:.0%}")
+
+    # ==========================================================
+    # Control
+    # ==========================================================
+    def check(self, memory=None, backend=None):
+        ratios = self.usage()
+        if not ratios:
+            return self.level
+
+        ratio = max(ratios.values())
+        if ratio >= 1.0:
+            level = CRITICAL
+        elif ratio >= HARD_RATIO:
+            level = HARD
+        elif ratio >= SOFT_RATIO:
+            level = SOFT
+        else:
+            level = OK
+
+        if level != self.level:
+            self.level = level
+            GOV_LEVEL.set(LEVEL_VALUE[level])
+            self._decide("level_change", ", ".join(f"{k}={v:.0%}" for k, v in ratios.items()), ratio)
+
+        if level in (HARD, CRITICAL):
+            self._evict(memory, ratio)
+
+        now = time.time()
+        if now - self.last_adjust < ADJUST_COOLDOWN_S:
+            return self.level
+
+        if level in (SOFT, HARD, CRITICAL):
+            self._tighten(backend, ratio)
+            self.last_adjust = now
+        elif ratio < RECOVER_RATIO:
+            self._relax(backend, ratio)
+            self.last_adjust = now
+
+        return self.level
+
+    def _tighten(self, backend, ratio):
+        if backend is not None and hasattr(backend, "max_pixels"):
+            if self.base_max_pixels is None:
+                self.base_max_pixels = backend.max_pixels
+            # The backend never goes below its own min_pixels
+            floor = max(MIN_MAX_PIXELS, getattr(backend, "min_pixels", 0))
+            new = max(floor, backend.max_pixels // 2)
+            if new < backend.max_pixels:
+                backend.set_max_pixels(new)
+                self._decide("lower_visual_tokens", f"max_pixels={backend.max_pixels}", ratio)
+
+        if self.context_scale > 0.25:
+            self.context_scale /= 2
+            self._decide("shrink_context", f"scale={self.context_scale}", ratio)
+
+    def _evict(self, memory, ratio):
+        freed = memory.evict_frames(keep_last=KEEP_RECENT_FRAMES) if memory is not None else 0
+        if not freed:
+            return
+        self._free_caches()
+        self._decide("evict_frames", f"freed={freed}", ratio)
+
+    @staticmethod
+    def _free_caches():
+        gc.collect()
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _relax(self, backend, ratio):
+        if backend is not None and self.base_max_pixels is not None:
+            if backend.max_pixels < self.base_max_pixels:
+                new = min(self.base_max_pixels, backend.max_pixels * 2)
+                backend.set_max_pixels(new)
+                self._decide("restore_visual_tokens", f"max_pixels={backend.max_pixels}", ratio)
+
+        if self.context_scale < 1.0:
+            self.context_scale = min(1.0, self.context_scale * 2)
+            self._decide("restore_context", f"scale={self.context_scale}", ratio)
+
+    def context_frames(self, default):
+        return max(MIN_CONTEXT_FRAMES, int(round(default * self.context_scale)))
+
+    def wait_until_admitted(self, timeout=ADMIT_TIMEOUT_S, reclaim=None):
+        """
+        Block a new episode while over budget. Between episodes nothing
+        else frees memory, so `reclaim` (e.g. dropping idle simulators) and
+        the caches are released first. Returns False if usage is still over
+        budget after `timeout` seconds; the caller decides what to skip.
+        """
+        if self.check() != CRITICAL:
+            return True
+
+        t0 = time.time()
+        self._decide("pause_episodes", "reclaiming memory", max(self.usage().values(), default=0.0))
+        if reclaim is not None:
+            reclaim()
+        self._free_caches()
+
+        while self.check() == CRITICAL:
+            if timeout is not None and time.time() - t0 > timeout:
+                ratio = max(self.usage().values(), default=0.0)
+                self._decide("admit_timeout", f"still over budget after {timeout:.0f}s", ratio)
+                return False
+            time.sleep(ADMIT_POLL_S)
+            gc.collect()
+
+        ratio = max(self.usage().values(), default=0.0)
+        self._decide("resume_episodes", f"after {time.time() - t0:.0f}s", ratio)
+        return True
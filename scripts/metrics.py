@@ -0,0 +1,347 @@
+# scripts/metrics.py
+
+import os
+import json
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -------------------------
+# Tunable constants
+# -------------------------
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SNAPSHOT_DIR = "outputs/metrics"
+SNAPSHOT_INTERVAL = 15.0  # seconds
+
+
+def process_rss_bytes():
+    """Resident set size in bytes (Linux /proc), or None if unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+# ==========================================================
+# Metric types
+# ==========================================================
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, **kw):
+        """Child metric for one label set. Bind once outside hot loops."""
+        key = tuple(str(kw[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        if not self.labelnames:
+            return [((), self)]
+        with self._lock:
+            return list(self._children.items())
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1.0):
+        with self._lock:
+            self.value += n
+
+
+class Counter(_Metric, _CounterValue):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        _Metric.__init__(self, name, help_text, labelnames)
+        _CounterValue.__init__(self)
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def render(self):
+        return [f"{self.name}_total{_fmt_labels(self.labelnames, k)} {c.value}" for k, c in self._items()]
+
+    def snapshot(self):
+        return {",".join(k) or "": c.value for k, c in self._items()}
+
+
+class _GaugeValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, v):
+        # A single float store is atomic under the GIL
+        self.value = float(v)
+
+
+class Gauge(_Metric, _GaugeValue):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        _Metric.__init__(self, name, help_text, labelnames)
+        _GaugeValue.__init__(self)
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def render(self):
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {g.value}" for k, g in self._items()]
+
+    def snapshot(self):
+        return {",".join(k) or "": g.value for k, g in self._items()}
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v):
+        i = bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0)
+
+
+class Histogram(_Metric, _HistogramValue):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        _Metric.__init__(self, name, help_text, labelnames)
+        _HistogramValue.__init__(self, tuple(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def render(self):
+        lines = []
+        for k, h in self._items():
+            with h._lock:
+                counts, total, n = list(h.counts), h.sum, h.count
+            cum = 0
+            for b, c in zip(h.buckets, counts):
+                cum += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, ('le', b))} {cum}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, ('le', '+Inf'))} {n}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {n}")
+        return lines
+
+    def snapshot(self):
+        return {
+            ",".join(k) or "": {"count": h.count, "sum": h.sum, "mean": h.sum / h.count if h.count else 0.0}
+            for k, h in self._items()
+        }
+
+
+# ==========================================================
+# Registry
+# ==========================================================
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, fn):
+        """fn() is called before every scrape / snapshot to refresh gauges."""
+        self._collectors.append(fn)
+
+    def collect(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print("[METRICS] Collector failed:", e)
+
+    def render_text(self):
+        self.collect()
+        lines = []
+        for m in list(self.metrics.values()):
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        self.collect()
+        return {
+            "timestamp": time.time(),
+            "metrics": {m.name: m.snapshot() for m in list(self.metrics.values())},
+        }
+
+
+REGISTRY = Registry()
+
+
+# ==========================================================
+# Exporters
+# ==========================================================
+def start_http_server(port, registry=REGISTRY, addr="127.0.0.1"):
+    """Serve Prometheus text format on http://addr:port/metrics."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[METRICS] Serving http://{addr}:{port}/metrics")
+    return server
+
+
+def write_snapshot(path, registry=REGISTRY):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+def start_snapshot_writer(out_dir=SNAPSHOT_DIR, interval=SNAPSHOT_INTERVAL, registry=REGISTRY):
+    """
+    Periodically write outputs/metrics/snapshot.json (atomically replaced).
+    Returns a stop() callable that writes one final snapshot.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "snapshot.json")
+    event = threading.Event()
+
+    def loop():
+        while not event.wait(interval):
+            write_snapshot(path, registry)
+        write_snapshot(path, registry)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+
+    def stop():
+        event.set()
+        thread.join()
+
+    return stop
+
+
+# ==========================================================
+# Pipeline metrics
+# ==========================================================
+CONTROL_STEPS = REGISTRY.counter("esr_control_steps", "Control-loop iterations")
+SIM_STEPS = REGISTRY.counter("esr_sim_steps", "Primitive actions applied to the simulator")
+STEP_SECONDS = REGISTRY.histogram("esr_step_seconds", "Wall time per control-loop iteration")
+STEPS_PER_SECOND = REGISTRY.gauge("esr_steps_per_second", "Control steps/sec of the last episode")
+
+MOVES = REGISTRY.counter("esr_move_forward", "move_forward outcomes", ["result"])
+MOVE_OK = MOVES.labels(result="ok")
+MOVE_RECOVERED = MOVES.labels(result="recovered")
+MOVE_BLOCKED = MOVES.labels(result="blocked")
+
+VLM_CALLS = REGISTRY.counter("esr_vlm_calls", "Backend generate() calls")
+VLM_PREFILL_SECONDS = REGISTRY.histogram("esr_vlm_prefill_seconds", "Time to first generated token")
+VLM_DECODE_SECONDS = REGISTRY.histogram("esr_vlm_decode_seconds", "Time from first to last generated token")
+VLM_SECONDS = REGISTRY.histogram("esr_vlm_seconds", "End-to-end backend call latency")
+VLM_PROMPT_TOKENS = REGISTRY.counter("esr_vlm_prompt_tokens", "Prompt tokens (text + visual)")
+VLM_GENERATED_TOKENS = REGISTRY.counter("esr_vlm_generated_tokens", "Generated tokens")
+VLM_CALLS_SAVED = REGISTRY.counter("esr_vlm_calls_saved", "Perception calls skipped by place recognition")
+VLM_LOAD_SECONDS = REGISTRY.gauge("esr_vlm_load_seconds", "Processor + weight load time of the last backend")
+VLM_WARMUP_SECONDS = REGISTRY.gauge("esr_vlm_warmup_seconds", "Synthetic warm-up generate() time")
+VLM_FIRST_PERCEPTION_SECONDS = REGISTRY.gauge(
+    "esr_vlm_first_perception_seconds", "Backend creation to first perception result"
+)
+
+FRAMES_SAVED = REGISTRY.counter("esr_frames_saved", "Frames written to disk")
+FRAME_SAVE_SECONDS = REGISTRY.histogram("esr_frame_save_seconds", "Frame encode + write time")
+
+EPISODES = REGISTRY.counter("esr_episodes", "Finished episodes", ["outcome"])
+EPISODE_SECONDS = REGISTRY.histogram(
+    "esr_episode_seconds", "Episode wall time", buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+
+PROCESS_RSS = REGISTRY.gauge("esr_process_rss_bytes", "Resident set size of this process")
+
+
+def _collect_process():
+    rss = process_rss_bytes()
+    if rss is not None:
+        PROCESS_RSS.set(rss)
+
+
+REGISTRY.add_collector(_collect_process)
@@ -0,0 +1,171 @@
+'''
+python -m scripts.multi_agent_episode --scene apartment_1.glb --agents 4
+'''
+import os
+import time
+import argparse
+
+from scripts.embodiment import make_sim, reset_agent, capture_frame, capture_depth, get_pose
+from scripts.actions import rotate, move_forward
+from scripts.view_memory import SpatialMemory
+from scripts.occupancy_map import OccupancyMap
+from scripts.exploration import FrontierPlanner
+from scripts.logging_utils import make_episode_dir, save_frame, save_episode_json
+from scripts.make_gallery import main as make_gallery
+
+SCENE_DIR = "habitat_data/scene_datasets/habitat-test-scenes"
+MAX_STEPS = 25
+
+
+class AgentSlot:
+    """Per-agent state: its own memory, explorer, action queue and episode dir."""
+
+    def __init__(self, sim, agent_id, use_depth, explorer):
+        self.agent_id = agent_id
+        self.agent = reset_agent(sim, agent_id=agent_id)
+        self.memory = SpatialMemory(occupancy=OccupancyMap() if use_depth else None)
+        self.planner = None
+        if explorer == "frontier":
+            self.planner = FrontierPlanner(sim.pathfinder, occupancy=self.memory.occupancy)
+
+        self.ep_id, self.ep_path = make_episode_dir()
+        self.frames_dir = os.path.join(self.ep_path, "frames")
+        self.queue = []
+        self.pending = "spawn"     # action label for the next recorded frame
+        self.sim_steps = 0
+
+    def record(self, obs):
+        frame = capture_frame(None, obs)
+        pose = get_pose(self.agent)
+        action = self.pending
+
+        self.memory.integrate_depth(capture_depth(obs), pose)
+        if self.planner is not None:
+            self.planner.observe(pose)
+
+        if frame is None:
+            print(f"[WARN] agent {self.agent_id}: bad frame after action: {action}")
+            self.memory.add_view(None, pose, action)
+            return
+
+        vid = self.memory.add_view(frame, pose, action)
+        path = os.path.join(self.frames_dir, f"{vid}.png")
+        save_frame(frame, path)
+        self.memory.views[-1]["frame_path"] = path
+
+    def act(self, sim):
+        """Apply exactly one primitive action this tick."""
+        if not self.queue:
+            if self.planner is not None:
+                self.queue = self.planner.next_actions(get_pose(self.agent))
+            else:
+                self.queue = [{"action": "move_forward", "distance": 0.6}]
+
+        act = self.queue.pop(0)
+        a = act.get("action")
+        self.sim_steps += 1
+
+        if a == "move_forward":
+            ok = move_forward(self.agent, sim, act.get("distance", 0.6))
+            self.pending = "move_forward" if ok else "blocked"
+            if not ok:
+                self.queue = []
+                if self.planner is not None:
+                    self.planner.report_blocked()
+                else:
+                    # Reactive fallback: turn away next tick
+                    self.queue = [{"action": "rotate", "angle_deg": 90}]
+
+        elif a == "rotate":
+            ang = act.get("angle_deg", 30)
+            rotate(self.agent, sim, ang)
+            self.pending = f"rotate{ang:+d}"
+
+        else:
+            rotate(self.agent, sim, 30)
+            self.pending = "scan"
+
+    def finish(self, scene_file, num_agents, explorer):
+        meta = {
+            "episode_id": self.ep_id,
+            "scene": scene_file,
+            "num_frames": len(self.memory.views),
+            "pattern": "multi_agent_v1",
+            "agent_id": self.agent_id,
+            "num_agents": num_agents,
+            "explorer": explorer,
+            "sim_steps": self.sim_steps,
+        }
+        if self.planner is not None:
+            meta["exploration"] = self.planner.stats()
+        if self.memory.occupancy is not None:
+            meta["occupancy"] = self.memory.occupancy.summary()
+
+        save_episode_json(
+            os.path.join(self.ep_path, "episode.json"),
+            {"meta": meta, "trajectory": self.memory.export_json()}
+        )
+        make_gallery(self.ep_path)
+
+
+def run_multi(scene_file, num_agents=4, max_steps=MAX_STEPS, use_depth=False,
+              explorer="frontier", sim_pool=None):
+    """
+    N agents in one simulator. Each tick every agent takes one action and
+    all observations come back from a single get_sensor_observations call.
+    """
+    scene_path = os.path.join(SCENE_DIR, scene_file)
+
+    if sim_pool is not None:
+        sim = sim_pool.acquire(scene_path, depth=use_depth, num_agents=num_agents)
+    else:
+        sim = make_sim(scene_path, depth=use_depth, num_agents=num_agents)
+
+    agent_ids = list(range(num_agents))
+    slots = [AgentSlot(sim, i, use_depth, explorer) for i in agent_ids]
+
+    t0 = time.perf_counter()
+    frames = 0
+
+    for step in range(max_steps + 1):
+        # Step 0 records spawn views; later ticks act first
+        if step > 0:
+            for slot in slots:
+                slot.act(sim)
+
+        obs_by_agent = sim.get_sensor_observations(agent_ids)
+        for slot in slots:
+            slot.record(obs_by_agent[slot.agent_id])
+        frames += num_agents
+
+    elapsed = time.perf_counter() - t0
+
+    if sim_pool is not None:
+        sim_pool.release(sim)
+    else:
+        sim.close()
+
+    for slot in slots:
+        slot.finish(scene_file, num_agents, explorer)
+
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    print(f"[MULTI] {num_agents} agents, {frames} frames in {elapsed:.1f}s ({fps:.1f} fps)")
+    return [slot.ep_id for slot in slots]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scene", required=True)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--depth", action="store_true")
+    parser.add_argument("--explorer", choices=["frontier", "reactive"], default="frontier")
+    args = parser.parse_args()
+
+    run_multi(
+        args.scene,
+        num_agents=args.agents,
+        max_steps=args.steps,
+        use_depth=args.depth,
+        explorer=args.explorer
+    )
@@ -0,0 +1,225 @@
+# scripts/navigation.py
+
+import os
+import sys
+import json
+import numpy as np
+
+from scripts.exploration import forward_xz, signed_yaw
+
+# -------------------------
+# Tunable constants
+# -------------------------
+SNAP_QUANTUM = 0.05       # cache key resolution (meters)
+MAX_STEP = 0.6            # longest single move_forward emitted
+MIN_TURN_DEG = 2          # smaller heading corrections are skipped
+CACHE_DIR = "outputs/nav_cache"
+
+# Process-wide caches, one per scene, so back-to-back episodes share them
+_SCENE_CACHES = {}
+
+
+def _key(p):
+    return tuple(int(round(float(c) / SNAP_QUANTUM)) for c in p)
+
+
+class GeodesicCache:
+    """
+    Memoized navmesh shortest paths for one scene.
+    Keys are snapped, quantized (start, end) positions; paths are
+    symmetric, so each query fills both directions.
+    """
+
+    def __init__(self, scene_id):
+        self.scene_id = scene_id
+        self.paths = {}           # (start_key, end_key) -> (distance, points)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def get(self, start_key, end_key):
+        entry = self.paths.get((start_key, end_key))
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def put(self, start_key, end_key, distance, points):
+        self.paths[(start_key, end_key)] = (distance, points)
+        self.paths[(end_key, start_key)] = (distance, points[::-1])
+        self.misses += 1
+        self.dirty = True
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def _file(self, cache_dir):
+        name = os.path.splitext(os.path.basename(self.scene_id))[0]
+        return os.path.join(cache_dir, f"{name}.json")
+
+    def load(self, cache_dir=CACHE_DIR):
+        path = self._file(cache_dir)
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            data = json.load(f)
+        for e in data.get("paths", []):
+            self.paths[(tuple(e["start"]), tuple(e["end"]))] = (e["distance"], e["points"])
+        print(f"[NAV] Loaded {len(self.paths)} cached paths for {self.scene_id}")
+
+    def save(self, cache_dir=CACHE_DIR):
+        if not self.dirty:
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        entries = [
+            {"start": list(s), "end": list(e), "distance": d, "points": pts}
+            for (s, e), (d, pts) in self.paths.items()
+        ]
+        # Atomic replace: episodes sharing a scene may save concurrently
+        path = self._file(cache_dir)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"scene": self.scene_id, "paths": entries}, f)
+        os.replace(tmp, path)
+        self.dirty = False
+
+
+def _path_type(pathfinder):
+    """ShortestPath request type of the pathfinder's own library."""
+    module = sys.modules.get(type(pathfinder).__module__)
+    if module is not None and hasattr(module, "ShortestPath"):
+        return module.ShortestPath
+    # habitat_sim binds PathFinder in an extension submodule
+    import habitat_sim
+    return habitat_sim.ShortestPath
+
+
+def get_scene_cache(scene_id, cache_dir=CACHE_DIR):
+    if scene_id not in _SCENE_CACHES:
+        cache = GeodesicCache(scene_id)
+        cache.load(cache_dir)
+        _SCENE_CACHES[scene_id] = cache
+    return _SCENE_CACHES[scene_id]
+
+
+class Navigator:
+    """
+    Goal-directed navigation over the scene navmesh.
+
+    Plans geodesic paths between SpatialMemory nodes or arbitrary points
+    and compiles them into rotate / move_forward symbolic actions.
+    """
+
+    def __init__(self, pathfinder, scene_id, cache_dir=CACHE_DIR):
+        self.pathfinder = pathfinder
+        self.cache_dir = cache_dir
+        self.cache = get_scene_cache(scene_id, cache_dir)
+        self.path_type = _path_type(pathfinder)
+
+    def _snap(self, p):
+        snapped = np.asarray(self.pathfinder.snap_point(np.asarray(p, dtype=np.float32)))
+        if not np.all(np.isfinite(snapped)):
+            return None
+        return snapped
+
+    def shortest_path(self, start, end):
+        """(geodesic distance, [points]) or (inf, []) if unreachable."""
+        s = self._snap(start)
+        e = self._snap(end)
+        if s is None or e is None:
+            return float("inf"), []
+
+        sk, ek = _key(s), _key(e)
+        cached = self.cache.get(sk, ek)
+        if cached is not None:
+            return cached
+
+        path = self.path_type()
+        path.requested_start = s
+        path.requested_end = e
+
+        if self.pathfinder.find_path(path) and np.isfinite(path.geodesic_distance):
+            distance = float(path.geodesic_distance)
+            points = [[float(c) for c in p] for p in path.points]
+        else:
+            distance, points = float("inf"), []
+
+        self.cache.put(sk, ek, distance, points)
+        return distance, points
+
+    def distance(self, start, end):
+        return self.shortest_path(start, end)[0]
+
+    # -------------------------
+    # Memory-aware queries
+    # -------------------------
+    def nearest_node(self, memory, position, node_ids=None):
+        """Closest (by geodesic distance) memory node, or None."""
+        node_ids = node_ids if node_ids is not None else list(memory.graph)
+        best, best_d = None, float("inf")
+        for nid in node_ids:
+            d = self.distance(position, memory.graph[nid]["pose"]["position"])
+            if d < best_d:
+                best, best_d = nid, d
+        return best
+
+    def plan_to_node(self, memory, pose, node_id):
+        if node_id not in memory.graph:
+            return []
+        goal = memory.graph[node_id]["pose"]["position"]
+        return self.plan_to_point(pose, goal)
+
+    def plan_to_point(self, pose, goal):
+        distance, points = self.shortest_path(pose["position"], goal)
+        if not points:
+            print(f"[NAV] No path to {goal}")
+            return []
+        return compile_path(pose, points)
+
+    def save(self):
+        self.cache.save(self.cache_dir)
+
+    def stats(self):
+        return {
+            "cached_paths": len(self.cache.paths),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
+
+
+def _turn(heading, angle_deg):
+    """Ground-plane heading rotated by `angle_deg` (+left, as signed_yaw)."""
+    a = np.radians(angle_deg)
+    c, s = np.cos(a), np.sin(a)
+    return np.array([heading[0] * c + heading[1] * s, heading[1] * c - heading[0] * s], dtype=np.float32)
+
+
+def compile_path(pose, points):
+    """Turn navmesh waypoints into rotate / move_forward symbolic actions."""
+    heading = forward_xz(pose["rotation"])
+    cur = np.asarray(pose["position"], dtype=np.float32)[[0, 2]]
+    actions = []
+
+    for p in points:
+        target = np.array([p[0], p[2]], dtype=np.float32)
+        d = target - cur
+        dist = float(np.linalg.norm(d))
+        if dist < 1e-3:
+            continue
+
+        direction = d / dist
+        angle = int(round(signed_yaw(heading, direction)))
+        if abs(angle) >= MIN_TURN_DEG:
+            actions.append({"action": "rotate", "angle_deg": angle})
+            heading = _turn(heading, angle)
+
+        remaining = dist
+        while remaining > 1e-3:
+            step = min(MAX_STEP, remaining)
+            actions.append({"action": "move_forward", "distance": step})
+            remaining -= step
+
+        # Skipped / rounded turns leave the agent short of `target`; the
+        # next leg is aimed from where it will actually be
+        cur = cur + heading * dist
+
+    return actions
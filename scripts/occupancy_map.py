@@ -0,0 +1,220 @@
+# scripts/occupancy_map.py
+
+import numpy as np
+
+from scripts.embodiment import CAMERA_HEIGHT, SENSOR_HFOV, SENSOR_RESOLUTION
+
+# -------------------------
+# Tunable constants
+# -------------------------
+CELL_SIZE = 0.1           # meters per grid cell
+PIXEL_STRIDE = 4          # back-project every N-th pixel of a full-res frame in each direction
+MAX_DEPTH = 5.0           # ignore returns beyond this range
+OBSTACLE_MIN_H = 0.15     # heights (above agent floor) counted as obstacles
+OBSTACLE_MAX_H = 1.6
+RAY_SAMPLES = 24          # free-space samples along each ray
+GROW_MARGIN = 32          # extra cells added when the grid is extended
+
+UNKNOWN = -1
+FREE = 0
+OCCUPIED = 1
+
+
+def quat_to_matrix(q):
+    """[w, x, y, z] -> 3x3 rotation matrix."""
+    w, x, y, z = q
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ], dtype=np.float32)
+
+
+class OccupancyMap:
+    """
+    Incremental 2D occupancy grid on the ground (x, z) plane.
+
+    Each depth frame is back-projected with the pinhole model implied by
+    the sensor hfov, points in the obstacle height band become hits, and
+    cells along each ray become free. Work per frame depends only on the
+    (strided) pixel count, never on map size; the dense grid grows by
+    padding when observations leave its current extent.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE, hfov=SENSOR_HFOV,
+                 camera_height=CAMERA_HEIGHT, pixel_stride=PIXEL_STRIDE,
+                 max_depth=MAX_DEPTH):
+        self.cell_size = cell_size
+        self.hfov = hfov
+        self.camera_height = camera_height
+        self.pixel_stride = pixel_stride
+        self.max_depth = max_depth
+
+        # Evidence counters; state is derived from them on query
+        self.hits = np.zeros((0, 0), dtype=np.uint16)
+        self.misses = np.zeros((0, 0), dtype=np.uint16)
+        self.origin = None     # world (x, z) of cell [0, 0]
+        self.num_frames = 0
+
+        self._rays = {}        # (h, w) -> cached camera-frame ray directions
+
+    # ==========================================================
+    # Grid bookkeeping
+    # ==========================================================
+    def _ensure_extent(self, xz_min, xz_max):
+        if self.origin is None:
+            self.origin = np.floor(xz_min / self.cell_size) * self.cell_size - GROW_MARGIN * self.cell_size
+            size = np.ceil((xz_max - self.origin) / self.cell_size).astype(int) + GROW_MARGIN
+            self.hits = np.zeros((size[0], size[1]), dtype=np.uint16)
+            self.misses = np.zeros_like(self.hits)
+            return
+
+        lo = np.floor((xz_min - self.origin) / self.cell_size).astype(int)
+        hi = np.ceil((xz_max - self.origin) / self.cell_size).astype(int)
+        pad_lo = np.where(lo < 0, -lo + GROW_MARGIN, 0)
+        pad_hi = np.where(hi >= self.hits.shape, hi - self.hits.shape + 1 + GROW_MARGIN, 0)
+
+        if not (pad_lo.any() or pad_hi.any()):
+            return
+
+        pad = ((pad_lo[0], pad_hi[0]), (pad_lo[1], pad_hi[1]))
+        self.hits = np.pad(self.hits, pad)
+        self.misses = np.pad(self.misses, pad)
+        self.origin = self.origin - pad_lo * self.cell_size
+
+    def world_to_cell(self, xz):
+        return np.floor((np.asarray(xz) - self.origin) / self.cell_size).astype(int)
+
+    def cell_to_world(self, ij):
+        return self.origin + (np.asarray(ij) + 0.5) * self.cell_size
+
+    # ==========================================================
+    # Fusion
+    # ==========================================================
+    def _stride(self, w):
+        """Pixel stride for a frame `w` wide: low-res depth samples the same directions."""
+        return max(1, int(round(self.pixel_stride * w / SENSOR_RESOLUTION[1])))
+
+    def _camera_rays(self, h, w):
+        # Full- and low-res depth alternate, so rays are kept per shape
+        if (h, w) not in self._rays:
+            f = (w / 2.0) / np.tan(np.deg2rad(self.hfov) / 2.0)
+            s = self._stride(w)
+            vs, us = np.mgrid[0:h:s, 0:w:s]
+            x = (us + 0.5 - w / 2.0) / f
+            y = -(vs + 0.5 - h / 2.0) / f
+            self._rays[(h, w)] = np.stack([x.ravel(), y.ravel(), -np.ones(x.size)], axis=1).astype(np.float32)
+        return self._rays[(h, w)]
+
+    def integrate(self, depth, pose):
+        if depth is None:
+            return
+
+        depth = np.asarray(depth, dtype=np.float32)
+        if depth.ndim == 3:
+            depth = depth[..., 0]
+
+        h, w = depth.shape
+        rays = self._camera_rays(h, w)
+        s = self._stride(w)
+        d = depth[::s, ::s].ravel()
+
+        valid = (d > 0) & np.isfinite(d)
+        hit = valid & (d <= self.max_depth)
+        d = np.where(hit, d, self.max_depth)
+
+        rot = quat_to_matrix(pose["rotation"])
+        agent_pos = np.asarray(pose["position"], dtype=np.float32)
+        cam_pos = agent_pos + rot @ np.array([0.0, self.camera_height, 0.0], dtype=np.float32)
+
+        # Depth sensors report z-depth, so scaling the unit-z ray by d is exact
+        pts = (rays[valid] * d[valid, None]) @ rot.T + cam_pos
+        hit = hit[valid]
+        if len(pts) == 0:
+            return
+
+        height = pts[:, 1] - float(agent_pos[1])
+
+        obstacle = hit & (height >= OBSTACLE_MIN_H) & (height <= OBSTACLE_MAX_H)
+
+        # Free space: sample along each ray up to (not including) its end cell
+        cam_xz = cam_pos[[0, 2]]
+        end_xz = pts[:, [0, 2]]
+        t = (np.arange(RAY_SAMPLES, dtype=np.float32) + 0.5) / RAY_SAMPLES
+        free_xz = cam_xz + (end_xz - cam_xz)[:, None, :] * t[None, :, None]
+        free_xz = free_xz.reshape(-1, 2)
+
+        self._ensure_extent(
+            np.minimum(end_xz.min(axis=0), cam_xz),
+            np.maximum(end_xz.max(axis=0), cam_xz),
+        )
+
+        shape = self.hits.shape
+        free_idx = np.unique(np.ravel_multi_index(self.world_to_cell(free_xz).T, shape))
+        occ_idx = np.unique(np.ravel_multi_index(self.world_to_cell(end_xz[obstacle]).T, shape))
+        free_idx = np.setdiff1d(free_idx, occ_idx, assume_unique=True)
+
+        # Floor returns inside range are observed free as well
+        floor = hit & (height < OBSTACLE_MIN_H)
+        floor_idx = np.ravel_multi_index(self.world_to_cell(end_xz[floor]).T, shape)
+        free_idx = np.union1d(free_idx, np.setdiff1d(floor_idx, occ_idx))
+
+        hits = self.hits.reshape(-1)
+        misses = self.misses.reshape(-1)
+        hits[occ_idx] = np.minimum(hits[occ_idx].astype(np.int32) + 1, np.iinfo(np.uint16).max)
+        misses[free_idx] = np.minimum(misses[free_idx].astype(np.int32) + 1, np.iinfo(np.uint16).max)
+
+        self.num_frames += 1
+
+    # ==========================================================
+    # Queries
+    # ==========================================================
+    def state_grid(self):
+        grid = np.full(self.hits.shape, UNKNOWN, dtype=np.int8)
+        seen = (self.hits.astype(np.int32) + self.misses) > 0
+        grid[seen] = FREE
+        # An obstacle needs to be seen at least as often as it was seen through
+        grid[seen & (self.hits >= self.misses)] = OCCUPIED
+        return grid
+
+    def state_at(self, position):
+        if self.origin is None:
+            return UNKNOWN
+        i, j = self.world_to_cell([position[0], position[2]])
+        if not (0 <= i < self.hits.shape[0] and 0 <= j < self.hits.shape[1]):
+            return UNKNOWN
+        h, m = int(self.hits[i, j]), int(self.misses[i, j])
+        if h + m == 0:
+            return UNKNOWN
+        return OCCUPIED if h >= m else FREE
+
+    def is_free(self, position):
+        return self.state_at(position) == FREE
+
+    def segment_clear(self, start, end, step=None):
+        """True if no cell on the ground-plane segment start -> end is occupied."""
+        start = np.asarray(start, dtype=np.float32)
+        end = np.asarray(end, dtype=np.float32)
+        step = step or self.cell_size / 2
+        n = max(2, int(np.linalg.norm(end[[0, 2]] - start[[0, 2]]) / step) + 1)
+        t = np.linspace(0.0, 1.0, n)[:, None]
+        pts = start + (end - start) * t
+        return all(self.state_at(p) != OCCUPIED for p in pts)
+
+    def summary(self):
+        grid = self.state_grid()
+        area = self.cell_size * self.cell_size
+        return {
+            "frames": self.num_frames,
+            "shape": list(grid.shape),
+            "free_m2": float((grid == FREE).sum() * area),
+            "occupied_m2": float((grid == OCCUPIED).sum() * area),
+        }
+
+    def to_image(self):
+        """uint8 RGB rendering: unknown gray, free white, occupied black."""
+        grid = self.state_grid()
+        img = np.full(grid.shape + (3,), 128, dtype=np.uint8)
+        img[grid == FREE] = 255
+        img[grid == OCCUPIED] = 0
+        return img
@@ -0,0 +1,230 @@
+'''
+python -m scripts.offline_eval --name baseline
+python -m scripts.offline_eval --name new_prompt --prompt-file prompts/perception_v2.txt --batch-size 32
+'''
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from scripts.logging_utils import save_frame, save_episode_json, VideoFrameReader
+from scripts.vlm_reasoner import VLMReasoner
+
+EPISODES_DIR = "outputs/episodes"
+EVAL_DIR = "outputs/offline_eval"
+BATCH_SIZE = 16
+QUESTION = "Find the bathroom"
+# Same window as cinematic_episode.CONTEXT_FRAMES, for trajectories that
+# predate the per-call "context_frames" field; not imported so replay
+# never pulls in habitat_sim
+CONTEXT_FRAMES = 6
+
+
+def _is_success(objects, scene_type):
+    return scene_type == "bathroom" or "toilet" in (objects or [])
+
+
+def rebuild_windows(trajectory, context_frames=CONTEXT_FRAMES):
+    """
+    Recreate the VLM inputs of a recorded episode.
+
+    A VLM step annotates the newest view with objects / scene_type, so
+    every annotated view marks a call whose context was the informative
+    views up to and including it. Recognized places (place_match) reused
+    earlier semantics without a VLM call and are skipped; the window size
+    is the one recorded for the call (the memory governor may shrink it),
+    `context_frames` only when none was recorded.
+    """
+    windows = []
+    for k, view in enumerate(trajectory):
+        if view.get("objects") is None and view.get("scene_type") is None:
+            continue
+        if view.get("place_match") is not None:
+            continue
+        n = view.get("context_frames") or context_frames
+
+        seen = trajectory[:k + 1]
+        informative = [v for v in seen if v.get("frame_path") is not None]
+        last_views = informative[-n:]
+        if last_views and last_views[-1].get("panorama"):
+            last_views = last_views[-1:]
+
+        # The summary the reasoner saw predates this call's own semantics
+        summary = [dict(v) for v in seen[-n:]]
+        summary[-1]["objects"] = None
+        summary[-1]["scene_type"] = None
+        summary[-1]["context_frames"] = None
+
+        windows.append({
+            "view_id": view.get("id", f"{k:03d}"),
+            "views": last_views,
+            "memory_summary": summary,
+            "recorded": {
+                "objects": view.get("objects") or [],
+                "scene_type": view.get("scene_type"),
+            },
+        })
+    return windows
+
+
+class FrameResolver:
+    """Maps trajectory views to image files, decoding video episodes into a scratch dir."""
+
+    def __init__(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix="offline_eval_")
+        self.readers = {}
+
+    def path(self, ep_id, view):
+        if view.get("frame_index") is None:
+            return view["frame_path"]
+
+        out = os.path.join(self.tmp_dir, f"{ep_id}_{view['id']}.png")
+        if not os.path.exists(out):
+            video = view["frame_path"]
+            if video not in self.readers:
+                self.readers[video] = VideoFrameReader(video)
+            frame = self.readers[video].read(view["frame_index"])
+            if frame is None:
+                return None
+            save_frame(frame, out)
+        return out
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def _iter_episodes(base):
+    for d in sorted(os.listdir(base)):
+        path = os.path.join(base, d, "episode.json")
+        if d.startswith("episode_") and os.path.exists(path):
+            with open(path, "r") as f:
+                yield d, json.load(f)
+
+
+def evaluate(name, base=EPISODES_DIR, out_base=EVAL_DIR, prompt=None,
+             batch_size=BATCH_SIZE, limit=None):
+    out_dir = os.path.join(out_base, name)
+    os.makedirs(out_dir, exist_ok=True)
+
+    reasoner = VLMReasoner(prompt=prompt)
+    resolver = FrameResolver()
+
+    totals = {
+        "episodes": 0, "windows": 0, "frames": 0,
+        "scene_type_agree": 0, "success_recorded": 0, "success_new": 0,
+        "perception_s": 0.0,
+    }
+
+    # Windows from many episodes are pooled so every backend call is full
+    pending = []
+    per_episode = {}
+
+    def flush():
+        if not pending:
+            return
+        batch = [
+            {"frame_paths": w["frame_paths"], "memory_summary": w["memory_summary"]}
+            for _, w in pending
+        ]
+        t0 = time.perf_counter()
+        results = reasoner.reason_batch(QUESTION, batch)
+        totals["perception_s"] += time.perf_counter() - t0
+
+        for (ep_id, w), result in zip(pending, results):
+            new_objects = result["visible_objects"]
+            new_scene = result["scene_type_guess"]
+            rec = w["recorded"]
+            row = {
+                "view_id": w["view_id"],
+                "frames": w["frame_paths"],
+                "recorded": rec,
+                "new": {
+                    "objects": new_objects,
+                    "scene_type": new_scene,
+                    "next_actions": result["next_actions"],
+                    "confidence": result["confidence"],
+                },
+                "success_recorded": _is_success(rec["objects"], rec["scene_type"]),
+                "success_new": _is_success(new_objects, new_scene),
+            }
+            per_episode[ep_id]["windows"].append(row)
+
+            totals["windows"] += 1
+            totals["frames"] += len(w["frame_paths"])
+            totals["scene_type_agree"] += int(new_scene == rec["scene_type"])
+            totals["success_recorded"] += int(row["success_recorded"])
+            totals["success_new"] += int(row["success_new"])
+        pending.clear()
+
+    try:
+        for ep_id, data in _iter_episodes(base):
+            if limit is not None and totals["episodes"] >= limit:
+                break
+
+            per_episode[ep_id] = {"meta": data.get("meta", {}), "windows": []}
+            totals["episodes"] += 1
+
+            for w in rebuild_windows(data.get("trajectory", [])):
+                paths = [resolver.path(ep_id, v) for v in w.pop("views")]
+                w["frame_paths"] = [p for p in paths if p]
+                pending.append((ep_id, w))
+                if len(pending) >= batch_size:
+                    flush()
+        flush()
+    finally:
+        resolver.close()
+
+    for ep_id, res in per_episode.items():
+        rows = res["windows"]
+        res["success_recorded"] = any(r["success_recorded"] for r in rows)
+        res["success_new"] = any(r["success_new"] for r in rows)
+        save_episode_json(os.path.join(out_dir, f"{ep_id}.json"), res)
+
+    n = max(totals["windows"], 1)
+    secs = max(totals["perception_s"], 1e-9)
+    summary = dict(totals)
+    summary.update({
+        "scene_type_agreement": totals["scene_type_agree"] / n,
+        "episode_success_recorded": sum(r["success_recorded"] for r in per_episode.values()),
+        "episode_success_new": sum(r["success_new"] for r in per_episode.values()),
+        "windows_per_s": totals["windows"] / secs,
+        "frames_per_s": totals["frames"] / secs,
+        "batch_size": batch_size,
+    })
+    save_episode_json(os.path.join(out_dir, "summary.json"), summary)
+
+    print(
+        f"[EVAL] {totals['episodes']} episodes, {totals['windows']} windows, "
+        f"{summary['windows_per_s']:.2f} windows/s, "
+        f"scene agreement {summary['scene_type_agreement']:.2%}"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run perception over recorded episodes")
+    parser.add_argument("--name", required=True, help="Output subdirectory for this run")
+    parser.add_argument("--episodes", default=EPISODES_DIR)
+    parser.add_argument("--out", default=EVAL_DIR)
+    parser.add_argument("--prompt-file", help="Perception prompt to evaluate instead of the default")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--limit", type=int, help="Only the first N episodes")
+    args = parser.parse_args()
+
+    prompt = None
+    if args.prompt_file:
+        with open(args.prompt_file, "r") as f:
+            prompt = f.read().strip()
+
+    evaluate(
+        args.name,
+        base=args.episodes,
+        out_base=args.out,
+        prompt=prompt,
+        batch_size=args.batch_size,
+        limit=args.limit,
+    )
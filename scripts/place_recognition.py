@@ -0,0 +1,174 @@
+# scripts/place_recognition.py
+
+import numpy as np
+
+from scripts.quaternion import yaw_axes
+
+# -------------------------
+# Tunable constants
+# -------------------------
+DESC_SIZE = 64            # frames are block-averaged to DESC_SIZE x DESC_SIZE gray
+GRID = 4                  # GRID x GRID spatial cells per descriptor
+ORIENT_BINS = 8           # unsigned gradient orientations per cell
+LAYOUT_SIZE = 8           # LAYOUT_SIZE x LAYOUT_SIZE color thumbnail
+GRADIENT_DIM = GRID * GRID * ORIENT_BINS
+LAYOUT_DIM = LAYOUT_SIZE * LAYOUT_SIZE * 3
+DESC_DIM = GRADIENT_DIM + LAYOUT_DIM
+GRADIENT_FLOOR = 0.02     # weaker gradients (sensor noise, shading) are ignored
+MIN_CONTRAST = 1e-3       # flat parts (textureless / uniform) contribute zeros
+MATCH_THRESHOLD = 0.85    # cosine similarity for a confident match
+MATCH_RADIUS = 1.0        # meters between the two poses
+MATCH_MAX_YAW = 45.0      # degrees between the two headings
+INITIAL_CAPACITY = 64
+
+
+def _thumbnail(img, size):
+    """size x size x C block mean (nearest-pixel sampling for tiny inputs)."""
+    h, w = img.shape[:2]
+    if h >= size and w >= size:
+        bh, bw = h // size, w // size
+        img = img[:bh * size, :bw * size]
+        return img.reshape(size, bh, size, bw, -1).mean(axis=(1, 3))
+
+    rows = np.linspace(0, h - 1, size).astype(np.int64)
+    cols = np.linspace(0, w - 1, size).astype(np.int64)
+    return img[np.ix_(rows, cols)]
+
+
+def _unit_centered(v):
+    v = v - v.mean()
+    n = np.linalg.norm(v)
+    return v / n if n > MIN_CONTRAST else np.zeros_like(v)
+
+
+# Per-pixel spatial cell of the DESC_SIZE x DESC_SIZE thumbnail
+_CELL = (np.arange(DESC_SIZE) * GRID // DESC_SIZE)
+_CELL_INDEX = (_CELL[:, None] * GRID + _CELL[None, :]) * ORIENT_BINS
+
+
+def global_descriptor(frame):
+    """
+    Compact whole-image descriptor (DESC_DIM floats, unit norm).
+
+    Two equally weighted halves, each mean-centred and normalized so the
+    dot product of two descriptors is the average of two correlations:
+    - structure: magnitude-weighted gradient orientation histograms over
+      a GRID x GRID layout of a downsampled gray frame (square-rooted)
+    - appearance: a LAYOUT_SIZE x LAYOUT_SIZE color thumbnail
+    Both are insensitive to global brightness changes.
+    """
+    rgb = np.asarray(frame)
+    if rgb.ndim == 2:
+        rgb = np.repeat(rgb[..., None], 3, axis=2)
+    # Subsample to ~2x the thumbnail before the float block mean
+    stride = max(1, min(rgb.shape[0], rgb.shape[1]) // (2 * DESC_SIZE))
+    rgb = rgb[::stride, ::stride, :3].astype(np.float32) / 255.0
+    rgb = _thumbnail(rgb, DESC_SIZE)
+
+    gray = rgb.mean(axis=2)
+    gy, gx = np.gradient(gray)
+    mag = np.hypot(gx, gy)
+    mag[mag < GRADIENT_FLOOR] = 0.0
+    angle = np.mod(np.arctan2(gy, gx), np.pi)
+    # Bins are centred on 0 / 90 degrees so axis-aligned edges (walls, door
+    # frames) don't flicker between neighbouring bins
+    bins = np.floor(angle / np.pi * ORIENT_BINS + 0.5).astype(np.int64) % ORIENT_BINS
+    hist = np.bincount(
+        (_CELL_INDEX + bins).ravel(), weights=mag.ravel(), minlength=GRADIENT_DIM
+    )
+
+    layout = _thumbnail(rgb, LAYOUT_SIZE)
+    layout = layout - layout.mean(axis=(0, 1))   # per-channel, so tint shifts cancel
+
+    desc = np.concatenate([_unit_centered(np.sqrt(hist)), _unit_centered(layout.ravel())])
+    return (desc * np.sqrt(0.5)).astype(np.float32)
+
+
+def _heading(rotation):
+    """Ground-plane unit heading (-Z forward) of a [w, x, y, z] rotation."""
+    return yaw_axes(rotation)[0].astype(np.float32)
+
+
+class PlaceIndex:
+    """
+    Brute-force nearest-neighbour index over place descriptors.
+
+    Descriptors, positions and headings live in preallocated arrays
+    (grown by doubling), so a query is one matrix-vector product plus
+    vectorized pose gating. A match must look alike AND be near in
+    position and heading, which keeps aliasing (two similar corridors)
+    from reusing the wrong semantics.
+    """
+
+    def __init__(self, threshold=MATCH_THRESHOLD, radius=MATCH_RADIUS,
+                 max_yaw=MATCH_MAX_YAW, capacity=INITIAL_CAPACITY):
+        self.threshold = threshold
+        self.radius = radius
+        self.min_cos_yaw = float(np.cos(np.radians(max_yaw)))
+
+        self.vectors = np.zeros((capacity, DESC_DIM), dtype=np.float32)
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.headings = np.zeros((capacity, 2), dtype=np.float32)
+        self.ids = []
+
+        self.queries = 0
+        self.matches = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _grow(self):
+        cap = self.vectors.shape[0] * 2
+        for name in ("vectors", "positions", "headings"):
+            old = getattr(self, name)
+            new = np.zeros((cap,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self.ids)] = old[:len(self.ids)]
+            setattr(self, name, new)
+
+    def add(self, node_id, descriptor, pose):
+        n = len(self.ids)
+        if n == self.vectors.shape[0]:
+            self._grow()
+        self.vectors[n] = descriptor
+        self.positions[n] = pose["position"]
+        self.headings[n] = _heading(pose["rotation"])
+        self.ids.append(node_id)
+
+    def search(self, descriptor, k=1):
+        """Top-k (node_id, similarity) by descriptor alone, best first."""
+        n = len(self.ids)
+        if n == 0:
+            return []
+        sims = self.vectors[:n] @ descriptor
+        k = min(k, n)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.ids[i], float(sims[i])) for i in top]
+
+    def match(self, descriptor, pose, exclude=None):
+        """(node_id, similarity) of a confident revisit of `pose`, or None."""
+        self.queries += 1
+        n = len(self.ids)
+        if n == 0:
+            return None
+
+        sims = self.vectors[:n] @ descriptor
+        dist = np.linalg.norm(self.positions[:n] - np.asarray(pose["position"], dtype=np.float32), axis=1)
+        cos_yaw = self.headings[:n] @ _heading(pose["rotation"])
+
+        ok = (sims >= self.threshold) & (dist <= self.radius) & (cos_yaw >= self.min_cos_yaw)
+        if exclude is not None and exclude in self.ids:
+            ok[self.ids.index(exclude)] = False
+        if not ok.any():
+            return None
+
+        best = int(np.argmax(np.where(ok, sims, -np.inf)))
+        self.matches += 1
+        return self.ids[best], float(sims[best])
+
+    def stats(self):
+        return {
+            "indexed": len(self.ids),
+            "queries": self.queries,
+            "matches": self.matches,
+        }
@@ -0,0 +1,57 @@
+# scripts/quaternion.py
+
+import numpy as np
+
+
+class Quaternion:
+    """
+    Minimal stand-in for the numpy-quaternion type habitat_sim uses:
+    w / x / y / z attributes and the Hamilton product.
+    """
+
+    __slots__ = ("w", "x", "y", "z")
+
+    def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+        self.w, self.x, self.y, self.z = float(w), float(x), float(y), float(z)
+
+    def __mul__(self, o):
+        return Quaternion(
+            self.w * o.w - self.x * o.x - self.y * o.y - self.z * o.z,
+            self.w * o.x + self.x * o.w + self.y * o.z - self.z * o.y,
+            self.w * o.y - self.x * o.z + self.y * o.w + self.z * o.x,
+            self.w * o.z + self.x * o.y - self.y * o.x + self.z * o.w,
+        )
+
+    def normalized(self):
+        n = np.sqrt(self.w ** 2 + self.x ** 2 + self.y ** 2 + self.z ** 2)
+        return Quaternion(self.w / n, self.x / n, self.y / n, self.z / n)
+
+    def __repr__(self):
+        return f"quaternion({self.w}, {self.x}, {self.y}, {self.z})"
+
+
+try:
+    # Real habitat installs keep their native quaternion type everywhere
+    from habitat_sim.utils.common import quat_from_angle_axis
+except ImportError:
+    def quat_from_angle_axis(theta, axis):
+        axis = np.asarray(axis, dtype=np.float64)
+        axis = axis / np.linalg.norm(axis)
+        s = np.sin(theta / 2.0)
+        return Quaternion(np.cos(theta / 2.0), axis[0] * s, axis[1] * s, axis[2] * s)
+
+
+def yaw_axes(rotation):
+    """
+    Ground-plane (forward, right) unit vectors as (x, z) of any w/x/y/z
+    rotation, or of a [w, x, y, z] list as stored in logged poses.
+    """
+    if hasattr(rotation, "w"):
+        w, x, y, z = rotation.w, rotation.x, rotation.y, rotation.z
+    else:
+        w, x, y, z = rotation
+    forward = np.array([-2.0 * (x * z + w * y), -(1.0 - 2.0 * (x * x + y * y))])
+    n = np.linalg.norm(forward)
+    forward = forward / n if n > 1e-6 else np.array([0.0, -1.0])
+    right = np.array([-forward[1], forward[0]])
+    return forward, right
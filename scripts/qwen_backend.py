@@ -1,76 +1,254 @@
+import gc
+import time
+import threading
 import torch
+from PIL import Image
 from transformers import AutoProcessor, Qwen2VLForConditionalGeneration
 from qwen_vl_utils import process_vision_info
 
+from scripts.metrics import (
+    VLM_CALLS, VLM_SECONDS, VLM_PREFILL_SECONDS, VLM_DECODE_SECONDS,
+    VLM_PROMPT_TOKENS, VLM_GENERATED_TOKENS,
+    VLM_LOAD_SECONDS, VLM_WARMUP_SECONDS, VLM_FIRST_PERCEPTION_SECONDS,
+)
+
+WARMUP_PROMPT = "Reply with OK."
+WARMUP_IMAGE_SIZE = 56      # two 28 px patches a side; resized up to min_pixels
+WARMUP_NEW_TOKENS = 2
+
+
+class _TimingStreamer:
+    """
+    Minimal generate() streamer that only timestamps: the first put() is
+    the prompt, the second is the first new token (end of prefill).
+    """
+
+    def __init__(self):
+        self.puts = 0
+        self.first_token = None
+
+    def put(self, value):
+        self.puts += 1
+        if self.puts == 2:
+            self.first_token = time.perf_counter()
+
+    def end(self):
+        pass
+
 
 class QwenVLMBackend:
-    def __init__(self, model_name="Qwen/Qwen2-VL-2B-Instruct"):
+    """
+    Qwen2-VL perception backend.
+
+    With background=True the processor and weights load (and warm up) in
+    a daemon thread, so callers can build the simulator meanwhile; the
+    first run() blocks only for whatever load time is left. Startup
+    timings are kept in `self.timings`.
+    """
+
+    def __init__(self, model_name="Qwen/Qwen2-VL-2B-Instruct",
+                 min_pixels=256 * 28 * 28, max_pixels=512 * 28 * 28,
+                 background=False, warmup=True):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model_name = model_name
 
+        # ⚠️ Clamp visual token budget for VRAM safety
+        self.min_pixels = min_pixels
+        self.max_pixels = max_pixels
+        self.model = None
+        self.processor = None
+
+        self.created = time.perf_counter()
+        self.timings = {"load_s": None, "warmup_s": None, "wait_s": 0.0, "first_perception_s": None}
+        self._load_error = None
+        self._loader = None
+
+        if background:
+            self._loader = threading.Thread(
+                target=self._load_guarded, args=(warmup,), name="qwen-load", daemon=True
+            )
+            self._loader.start()
+        else:
+            self._load(warmup)
+
+    # ==========================================================
+    # Loading
+    # ==========================================================
+    def _load(self, warmup):
         print("[QWEN] Loading model...")
+        t0 = time.perf_counter()
+
+        self.processor = AutoProcessor.from_pretrained(
+            self.model_name,
+            min_pixels=self.min_pixels,
+            max_pixels=self.max_pixels
+        )
+        # The governor may have lowered the budget while we were loading
+        self.set_max_pixels(self.max_pixels)
 
-        # ⚠️ Force FP16 for 6GB GPUs
+        # ⚠️ Force FP16 for 6GB GPUs. safetensors checkpoints (preferred
+        # when present) are memory-mapped, and low_cpu_mem_usage streams
+        # them into the meta-initialised model without a random-init copy.
         self.model = Qwen2VLForConditionalGeneration.from_pretrained(
-            model_name,
+            self.model_name,
             torch_dtype=torch.float16,
-            device_map="auto"
+            device_map="auto",
+            low_cpu_mem_usage=True
         ).eval()
 
-        # ⚠️ Clamp visual token budget for VRAM safety
-        self.processor = AutoProcessor.from_pretrained(
-            model_name,
-            min_pixels=256 * 28 * 28,
-            max_pixels=512 * 28 * 28
-        )
-
-        print("[QWEN] Model loaded.")
+        self.timings["load_s"] = time.perf_counter() - t0
+        VLM_LOAD_SECONDS.set(self.timings["load_s"])
+        print(f"[QWEN] Model loaded ({self.timings['load_s']:.1f}s).")
+
+        if warmup:
+            self._warmup()
+
+    def _load_guarded(self, warmup):
+        try:
+            self._load(warmup)
+        except Exception as e:
+            # Re-raised in the caller's thread by _ready()
+            self._load_error = e
+
+    def _warmup(self):
+        """
+        Tiny synthetic generate() so CUDA kernels, the allocator and the
+        vision tower are initialised before the first real frame.
+        """
+        t0 = time.perf_counter()
+        image = Image.new("RGB", (WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE), (128, 128, 128))
+        try:
+            self._generate(WARMUP_PROMPT, [[image]], WARMUP_NEW_TOKENS, observe=False)
+        except Exception as e:
+            print("[QWEN] Warm-up failed (continuing):", e)
+            return
+        self.timings["warmup_s"] = time.perf_counter() - t0
+        VLM_WARMUP_SECONDS.set(self.timings["warmup_s"])
+        print(f"[QWEN] Warm-up done ({self.timings['warmup_s']:.1f}s).")
+
+    def _ready(self):
+        if self._loader is not None:
+            if self._loader.is_alive():
+                t0 = time.perf_counter()
+                self._loader.join()
+                self.timings["wait_s"] += time.perf_counter() - t0
+            self._loader = None
+        if self._load_error is not None:
+            raise RuntimeError(f"Qwen2-VL failed to load: {self._load_error}")
+
+    def close(self):
+        """Wait for a background load to finish, then free the weights."""
+        if self._loader is not None:
+            self._loader.join()
+            self._loader = None
+        self.model = None
+        self.processor = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def set_max_pixels(self, max_pixels):
+        """Change the per-image visual token budget (used by the memory governor)."""
+        max_pixels = max(int(max_pixels), self.min_pixels)
+        self.max_pixels = max_pixels
+        if self.processor is None:
+            # Still loading: applied once the processor exists
+            return
+        image_processor = self.processor.image_processor
+        image_processor.max_pixels = max_pixels
+        if isinstance(getattr(image_processor, "size", None), dict):
+            image_processor.size["max_pixels"] = max_pixels
+
+    @staticmethod
+    def _image_ref(image):
+        # Paths go through qwen_vl_utils' loader; in-memory PIL images are used as-is
+        return f"file://{image}" if isinstance(image, str) else image
 
     def run(self, prompt, frame_paths):
         if not frame_paths:
             raise ValueError("No frames provided to VLM backend")
 
-        messages = [
-            {
-                "role": "user",
-                "content": (
-                    [{"type": "image", "image": f"file://{p}"} for p in frame_paths]
-                )
-            }
+        return self.run_batch(prompt, [frame_paths])[0]
+
+    def run_batch(self, prompt, frame_path_lists):
+        """One generate() call over several independent frame windows."""
+        if not frame_path_lists or any(not paths for paths in frame_path_lists):
+            raise ValueError("No frames provided to VLM backend")
+
+        self._ready()
+        outputs = self._generate(prompt, frame_path_lists, 256)
+
+        if self.timings["first_perception_s"] is None:
+            self.timings["first_perception_s"] = time.perf_counter() - self.created
+            VLM_FIRST_PERCEPTION_SECONDS.set(self.timings["first_perception_s"])
+            print(f"[QWEN] First perception {self.timings['first_perception_s']:.1f}s after start "
+                  f"(waited {self.timings['wait_s']:.1f}s for load)")
+
+        return outputs
+
+    def _generate(self, prompt, frame_path_lists, max_new_tokens, observe=True):
+        conversations = [
+            [
+                {
+                    "role": "user",
+                    "content": (
+                        [{"type": "image", "image": self._image_ref(p)} for p in paths]
+                        + [{"type": "text", "text": prompt}]
+                    )
+                }
+            ]
+            for paths in frame_path_lists
         ]
 
-        messages[0]["content"] = list(messages[0]["content"]) + [
-            {"type": "text", "text": prompt}
+        texts = [
+            self.processor.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+            for messages in conversations
         ]
 
-        text = self.processor.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
+        image_inputs, video_inputs = process_vision_info(conversations)
 
-        image_inputs, video_inputs = process_vision_info(messages)
+        # Decoder-only batching needs left padding so every prompt ends
+        # right where generation starts
+        self.processor.tokenizer.padding_side = "left"
 
         inputs = self.processor(
-            text=[text],
+            text=texts,
             images=image_inputs,
             videos=video_inputs,
             padding=True,
             return_tensors="pt"
         ).to(self.device)
 
+        # Streamers are single-sequence only; batches get end-to-end timing
+        streamer = _TimingStreamer() if len(texts) == 1 and observe else None
+
+        t0 = time.perf_counter()
         with torch.no_grad():
             generated_ids = self.model.generate(
                 **inputs,
-                max_new_tokens=256,
-                do_sample=False
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                streamer=streamer
             )
+        t1 = time.perf_counter()
 
         generated_ids_trimmed = [
             out[len(inp):] for inp, out in zip(inputs.input_ids, generated_ids)
         ]
 
-        output_text = self.processor.batch_decode(
+        if observe:
+            VLM_CALLS.inc()
+            VLM_SECONDS.observe(t1 - t0)
+            if streamer is not None and streamer.first_token is not None:
+                VLM_PREFILL_SECONDS.observe(streamer.first_token - t0)
+                VLM_DECODE_SECONDS.observe(t1 - streamer.first_token)
+            VLM_PROMPT_TOKENS.inc(int(inputs.attention_mask.sum()))
+            VLM_GENERATED_TOKENS.inc(sum(len(g) for g in generated_ids_trimmed))
+
+        return self.processor.batch_decode(
             generated_ids_trimmed,
             skip_special_tokens=True,
             clean_up_tokenization_spaces=False
-        )[0]
-
-        return output_text
+        )
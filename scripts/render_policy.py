@@ -0,0 +1,126 @@
+# scripts/render_policy.py
+
+import math
+
+import numpy as np
+
+from scripts.quaternion import yaw_axes
+
+# -------------------------
+# Tunable constants
+# -------------------------
+HIGH_RES_LEAD = 2         # steps before each VLM call rendered at full resolution
+KEYFRAME_EVERY = None     # also keep a full-res frame every N steps (None = off)
+
+
+def before_vlm(step, vlm_interval, lead):
+    """True when `step` is one of the last `lead` steps before a VLM call."""
+    # Frames recorded during `step` are context for the next VLM call
+    steps_to_vlm = vlm_interval - (step % vlm_interval)
+    return steps_to_vlm <= lead
+
+
+class ResolutionPolicy:
+    """
+    Decides per step whether the full-resolution camera is rendered.
+
+    Full resolution is only needed for frames that are saved or sent to
+    the VLM: the spawn view, the last `lead` steps before each VLM call,
+    and optional periodic keyframes. Every other step runs on the
+    low-res sensor, which is enough for bad-frame checks and control.
+    """
+
+    def __init__(self, vlm_interval, lead=HIGH_RES_LEAD, keyframe_every=KEYFRAME_EVERY):
+        self.vlm_interval = vlm_interval
+        self.lead = lead
+        self.keyframe_every = keyframe_every
+
+    def high_res(self, step, action):
+        if action == "spawn":
+            return True
+
+        if self.keyframe_every and step % self.keyframe_every == 0:
+            return True
+
+        return before_vlm(step, self.vlm_interval, self.lead)
+
+
+# -------------------------
+# Recording
+# -------------------------
+RECORD_MODES = ("every", "stride", "pre_vlm", "pose_change", "keyframes")
+RECORD_STRIDE = 3         # "stride": keep every k-th recorded action
+MIN_MOVE = 0.5            # "pose_change": meters since the last rendered frame
+MIN_TURN_DEG = 45.0       # "pose_change": heading change since the last rendered frame
+ALWAYS_RENDER = ("spawn", "scan")   # keyframes in every mode
+
+
+class RecordingPolicy:
+    """
+    Decides per recorded action whether a frame is rendered and saved.
+
+    every       -> every action (previous behaviour)
+    stride      -> every `stride`-th action
+    pre_vlm     -> actions in the last `lead` steps before each VLM call
+    pose_change -> once the agent moved / turned enough since the last frame
+    keyframes   -> spawn, scans and the step right before each VLM call
+
+    Spawn and scan frames are always rendered. Skipped actions still log
+    their pose, so memory and the gallery keep one entry per action.
+    """
+
+    def __init__(self, mode="every", vlm_interval=None, stride=RECORD_STRIDE,
+                 lead=HIGH_RES_LEAD, min_move=MIN_MOVE, min_turn_deg=MIN_TURN_DEG):
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Unknown recording mode: {mode!r} (expected one of {RECORD_MODES})")
+        if mode in ("pre_vlm", "keyframes") and not vlm_interval:
+            raise ValueError(f"Recording mode {mode!r} needs vlm_interval")
+
+        self.mode = mode
+        self.vlm_interval = vlm_interval
+        self.stride = max(1, stride)
+        self.lead = 1 if mode == "keyframes" else lead
+        self.min_move = min_move
+        self.min_cos_turn = math.cos(math.radians(min_turn_deg))
+
+        self.actions = 0
+        self.rendered = 0
+        self.last_pose = None
+
+    def _pose_changed(self, pose):
+        if self.last_pose is None:
+            return True
+        p0, p1 = self.last_pose["position"], pose["position"]
+        if math.hypot(p1[0] - p0[0], p1[2] - p0[2]) >= self.min_move:
+            return True
+        return _cos_between(self.last_pose["rotation"], pose["rotation"]) <= self.min_cos_turn
+
+    def should_render(self, step, action, pose):
+        self.actions += 1
+
+        if action in ALWAYS_RENDER or self.mode == "every":
+            keep = True
+        elif self.mode == "stride":
+            keep = self.actions % self.stride == 0
+        elif self.mode == "pose_change":
+            keep = self._pose_changed(pose)
+        else:
+            keep = before_vlm(step, self.vlm_interval, self.lead)
+
+        if keep:
+            self.rendered += 1
+            self.last_pose = pose
+        return keep
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "actions": self.actions,
+            "rendered": self.rendered,
+            "skipped": self.actions - self.rendered,
+        }
+
+
+def _cos_between(q0, q1):
+    """Cosine of the yaw between two [w, x, y, z] rotations (-Z forward)."""
+    return float(np.dot(yaw_axes(q0)[0], yaw_axes(q1)[0]))
@@ -2,11 +2,24 @@
 python scripts/run_episode.py --scene apartment_1.glb
 python scripts/run_episode.py --scene van-gogh-room.glb
 python scripts/run_episode.py --scene skokloster-castle.glb
+python scripts/run_episode.py --scene apartment_1.glb --frame-mode video
+python scripts/run_episode.py --scene skokloster-castle.glb --episodes 10
+python scripts/run_episode.py --scene apartment_1.glb --agents 4
+python scripts/run_episode.py --backend gridworld --episodes 1000 --low-res 128
+python scripts/run_episode.py --scene apartment_1.glb --record keyframes
 
 '''
 import argparse
 import os
 from scripts.cinematic_episode import run
+from scripts.multi_agent_episode import run_multi
+from scripts.sim_pool import SimPool
+from scripts.metrics import start_http_server, start_snapshot_writer
+from scripts.memory_governor import MemoryGovernor
+from scripts.frame_pipeline import FramePipeline
+from scripts.gridworld import GRIDWORLD_PREFIX
+from scripts.render_policy import RECORD_MODES
+from scripts.vlm_reasoner import VLMReasoner
 
 SCENE_DIR = "habitat_data/scene_datasets/habitat-test-scenes"
 
@@ -14,14 +27,115 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--scene",
-        required=True,
+        default=None,
         help="Scene file in habitat_data (e.g. skokloster-castle.glb)"
     )
+    parser.add_argument(
+        "--backend",
+        choices=["habitat", "gridworld"],
+        default="habitat",
+        help="gridworld: procedural NumPy floor plans with ground-truth perception (no assets, no GPU)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="First gridworld floor-plan seed; episode i uses seed + i"
+    )
+    parser.add_argument(
+        "--frame-mode",
+        choices=["png", "video"],
+        default="png",
+        help="Store frames as individual PNGs or as one encoded video"
+    )
+    parser.add_argument(
+        "--depth",
+        action="store_true",
+        help="Add a depth sensor and build an occupancy map"
+    )
+    parser.add_argument(
+        "--explorer",
+        choices=["frontier", "reactive"],
+        default="reactive",
+        help="Policy for non-VLM steps"
+    )
+    parser.add_argument(
+        "--panorama",
+        action="store_true",
+        help="Add a 360° sensor so 'scan' is a single panoramic capture"
+    )
+    parser.add_argument(
+        "--low-res",
+        type=int,
+        default=None,
+        help="Add an NxN control sensor; full-res frames only when saved or sent to the VLM"
+    )
+    parser.add_argument(
+        "--record",
+        choices=RECORD_MODES,
+        default="every",
+        help="Which actions render and save a frame; poses are logged for all of them"
+    )
+    parser.add_argument(
+        "--record-stride",
+        type=int,
+        default=None,
+        help="k for --record stride (every k-th action)"
+    )
+    parser.add_argument(
+        "--place-recognition",
+        action="store_true",
+        help="Reuse perception of recognized (revisited) places instead of calling the VLM"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Run PNG writing and VLM perception in separate processes fed by shared memory"
+    )
+    parser.add_argument(
+        "--episodes",
+        type=int,
+        default=1,
+        help="Back-to-back episodes; the loaded scene is reused between them"
+    )
+    parser.add_argument(
+        "--agents",
+        type=int,
+        default=1,
+        help="Agents sharing one simulator (>1 runs exploration-only, no VLM)"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on localhost:PORT/metrics"
+    )
+    parser.add_argument(
+        "--metrics-snapshot",
+        action="store_true",
+        help="Write outputs/metrics/snapshot.json periodically"
+    )
+    parser.add_argument(
+        "--rss-budget-gb",
+        type=float,
+        default=None,
+        help="Host memory budget; degrade VLM / frame buffers before exceeding it"
+    )
+    parser.add_argument(
+        "--gpu-budget-gb",
+        type=float,
+        default=None,
+        help="GPU memory budget (defaults to the device total when CUDA is present)"
+    )
     args = parser.parse_args()
 
-    scene_path = os.path.join(SCENE_DIR, args.scene)
+    gridworld = args.backend == "gridworld"
+    if not gridworld and args.scene is None:
+        parser.error("--scene is required with the habitat backend")
+
+    scene_path = os.path.join(SCENE_DIR, args.scene or "")
 
-    if not os.path.exists(scene_path):
+    if not gridworld and not os.path.exists(scene_path):
         print("\n❌ ERROR: Scene not found\n")
         print("You asked for:", args.scene)
         print("\nAvailable scenes:\n")
@@ -31,4 +145,74 @@ if __name__ == "__main__":
         print()
         exit(1)
 
-    run(args.scene)
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    snapshot_stop = start_snapshot_writer() if args.metrics_snapshot else None
+
+    pool = SimPool()
+    pipeline = None
+    if args.pipeline and args.agents == 1:
+        # Gridworld perception is ground truth, so only the writer stage is needed
+        pipeline = FramePipeline(perception=not gridworld)
+
+    # One Qwen backend for the whole run, like the sim pool: loaded once in
+    # the background (overlapping the first scene load) and shared by every
+    # episode. Pipelines and gridworld scenes don't need it.
+    reasoner = None
+    if not gridworld and pipeline is None and args.agents == 1:
+        reasoner = VLMReasoner(background=True)
+
+    gb = 1024 ** 3
+    governor = MemoryGovernor(
+        rss_budget_bytes=int(args.rss_budget_gb * gb) if args.rss_budget_gb else None,
+        accel_budget_bytes=int(args.gpu_budget_gb * gb) if args.gpu_budget_gb else None
+    )
+
+    for i in range(args.episodes):
+        # Don't start another episode while over budget; if idle scenes and
+        # caches don't bring usage back in time, stop instead of swapping
+        if not governor.wait_until_admitted(reclaim=pool.evict_idle):
+            print(f"[GOV] Memory still over budget, stopping after {i} of {args.episodes} episodes")
+            break
+
+        # Every gridworld episode gets a fresh floor plan
+        scene = f"{GRIDWORLD_PREFIX}{args.seed + i}" if gridworld else args.scene
+
+        if args.agents > 1:
+            run_multi(
+                scene,
+                num_agents=args.agents,
+                use_depth=args.depth,
+                explorer=args.explorer,
+                sim_pool=pool
+            )
+            continue
+
+        run(
+            scene,
+            frame_mode=args.frame_mode,
+            use_depth=args.depth,
+            explorer=args.explorer,
+            sim_pool=pool,
+            use_panorama=args.panorama,
+            low_res=args.low_res,
+            governor=governor,
+            place_recognition=args.place_recognition,
+            pipeline=pipeline,
+            record_mode=args.record,
+            record_stride=args.record_stride,
+            reasoner=reasoner
+        )
+
+    print("[POOL]", pool.stats())
+    pool.close()
+
+    if reasoner is not None:
+        reasoner.close()
+
+    if pipeline is not None:
+        print("[PIPE]", pipeline.stats())
+        pipeline.close()
+
+    if snapshot_stop is not None:
+        snapshot_stop()
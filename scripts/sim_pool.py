@@ -0,0 +1,150 @@
+# scripts/sim_pool.py
+
+import os
+import time
+from collections import OrderedDict
+
+from scripts.embodiment import make_sim_config, create_sim
+from scripts.metrics import process_rss_bytes as current_rss
+
+# -------------------------
+# Tunable constants
+# -------------------------
+MAX_SIMS = 2                  # simulators kept alive at once
+MAX_POOL_BYTES = 8 * 1024 ** 3
+# Fallback cost estimate when RSS can't be measured: scene file size x factor
+SCENE_MEMORY_FACTOR = 4
+
+
+class SimPool:
+    """
+    Keeps configured simulator instances alive across episodes.
+
+    acquire() returns a simulator for (scene, sensor config): an idle one
+    for the same key is reused as-is; otherwise, when the pool is full,
+    the least recently used idle simulator is reconfigured in place to
+    the new scene instead of being torn down. The pool is bounded both by
+    count and by the estimated memory of the loaded scenes.
+    """
+
+    def __init__(self, max_sims=MAX_SIMS, max_bytes=MAX_POOL_BYTES):
+        self.max_sims = max_sims
+        self.max_bytes = max_bytes
+        self.idle = OrderedDict()    # key -> sim (LRU order, oldest first)
+        self.busy = {}               # id(sim) -> key
+        self.cost = {}               # key -> estimated bytes
+        self.stats_ = {
+            "loads": 0, "reuses": 0, "reconfigures": 0, "evictions": 0,
+            "load_s": 0.0, "reuse_s": 0.0, "reconfigure_s": 0.0,
+        }
+
+    # ==========================================================
+    # Bookkeeping
+    # ==========================================================
+    def _key(self, scene_path, sensor_opts):
+        return (scene_path,) + tuple(sorted(sensor_opts.items()))
+
+    def _estimate(self, key, rss_before):
+        rss_after = current_rss()
+        if rss_before is not None and rss_after is not None and rss_after > rss_before:
+            return rss_after - rss_before
+        try:
+            return os.path.getsize(key[0]) * SCENE_MEMORY_FACTOR
+        except OSError:
+            return 0
+
+    def _total_bytes(self):
+        return sum(self.cost.values())
+
+    def _num_sims(self):
+        return len(self.idle) + len(self.busy)
+
+    def _evict_lru(self):
+        key, sim = self.idle.popitem(last=False)
+        self.cost.pop(key, None)
+        sim.close()
+        self.stats_["evictions"] += 1
+        print(f"[POOL] Evicted {os.path.basename(key[0])}")
+
+    # ==========================================================
+    # Public API
+    # ==========================================================
+    def acquire(self, scene_path, **sensor_opts):
+        """`sensor_opts` are passed through to make_sim_config (depth, num_agents, ...)."""
+        key = self._key(scene_path, sensor_opts)
+        name = os.path.basename(scene_path)
+        t0 = time.perf_counter()
+
+        # ---------- Reuse: same scene, same sensors ----------
+        if key in self.idle:
+            sim = self.idle.pop(key)
+            sim.reset()
+            dt = time.perf_counter() - t0
+            self.stats_["reuses"] += 1
+            self.stats_["reuse_s"] += dt
+            self.busy[id(sim)] = key
+            print(f"[POOL] Reused {name} ({dt:.2f}s)")
+            return sim
+
+        rss_before = current_rss()
+        cfg = make_sim_config(scene_path, **sensor_opts)
+
+        # ---------- Reconfigure: pool full, recycle LRU idle sim ----------
+        if self.idle and self._num_sims() >= self.max_sims:
+            old_key, sim = self.idle.popitem(last=False)
+            self.cost.pop(old_key, None)
+            sim.reconfigure(cfg)
+            dt = time.perf_counter() - t0
+            self.stats_["reconfigures"] += 1
+            self.stats_["reconfigure_s"] += dt
+            self.cost[key] = self._estimate(key, rss_before)
+            self.busy[id(sim)] = key
+            print(f"[POOL] Reconfigured {os.path.basename(old_key[0])} -> {name} ({dt:.2f}s)")
+            return sim
+
+        # ---------- Fresh load ----------
+        sim = create_sim(cfg)
+        dt = time.perf_counter() - t0
+        self.stats_["loads"] += 1
+        self.stats_["load_s"] += dt
+        self.cost[key] = self._estimate(key, rss_before)
+        self.busy[id(sim)] = key
+        print(f"[POOL] Loaded {name} ({dt:.2f}s)")
+
+        # Memory bound: drop idle scenes until we fit again
+        while self.idle and self._total_bytes() > self.max_bytes:
+            self._evict_lru()
+
+        return sim
+
+    def release(self, sim):
+        key = self.busy.pop(id(sim), None)
+        if key is None or key in self.idle:
+            # Unknown sim, or a duplicate of an idle one: don't keep two
+            sim.close()
+            return
+
+        self.idle[key] = sim
+        self.idle.move_to_end(key)
+
+        while self.idle and (
+            self._num_sims() > self.max_sims or self._total_bytes() > self.max_bytes
+        ):
+            self._evict_lru()
+
+    def evict_idle(self):
+        """Close every idle simulator (e.g. to give memory back under pressure)."""
+        while self.idle:
+            self._evict_lru()
+
+    def close(self):
+        self.evict_idle()
+        if self.busy:
+            print(f"[POOL] WARNING: {len(self.busy)} simulators still in use at close")
+
+    def stats(self):
+        s = dict(self.stats_)
+        s["idle"] = len(self.idle)
+        s["busy"] = len(self.busy)
+        s["estimated_bytes"] = self._total_bytes()
+        return s
@@ -3,6 +3,8 @@
 import uuid
 import numpy as np
 
+from scripts.place_recognition import global_descriptor
+
 
 class ViewMemory:
     """
@@ -24,6 +26,21 @@ class ViewMemory:
         })
         return vid
 
+    def evict_frames(self, keep_last=0):
+        """Drop in-memory pixels of views already on disk; returns count freed."""
+        cutoff = max(0, len(self.views) - keep_last)
+        freed = 0
+        for v in self.views[:cutoff]:
+            if v.get("frame") is None or v.get("frame_path") is None:
+                continue
+            # Frames inside a video can't be read back until the writer is
+            # closed, so they stay in memory for the rest of the episode
+            if v.get("frame_index") is not None:
+                continue
+            v["frame"] = None
+            freed += 1
+        return freed
+
     def export_json(self):
         return [
             {
@@ -31,8 +48,14 @@ class ViewMemory:
                 "action": v["action"],
                 "pose": v["pose"],
                 "frame_path": v.get("frame_path"),
+                "frame_index": v.get("frame_index"),
+                "panorama": v.get("panorama", False),
+                "unrendered": v.get("unrendered", False),
+                "low_res": v.get("low_res", False),
                 "objects": v.get("objects"),
-                "scene_type": v.get("scene_type")
+                "scene_type": v.get("scene_type"),
+                "place_match": v.get("place_match"),
+                "context_frames": v.get("context_frames")
             }
             for v in self.views
         ]
@@ -44,11 +67,14 @@ class SpatialMemory(ViewMemory):
     Each view becomes a node; actions form edges.
     """
 
-    def __init__(self):
+    def __init__(self, occupancy=None, places=None):
         super().__init__()
         self.graph = {}     # node_id -> metadata
         self.edges = []     # (from, to, action)
         self.last_node = None
+        self.occupancy = occupancy   # optional OccupancyMap fed from depth
+        self.places = places         # optional PlaceIndex over annotated nodes
+        self.descriptors = {}        # node_id -> global descriptor (kept after frame eviction)
 
     def add_view(self, frame, pose, action, frame_path=None):
         vid = super().add_view(frame, pose, action, frame_path)
@@ -62,6 +88,9 @@ class SpatialMemory(ViewMemory):
             "visited": True
         }
 
+        if self.places is not None and frame is not None:
+            self.descriptors[vid] = global_descriptor(frame)
+
         # Create edge
         if self.last_node is not None:
             self.edges.append((self.last_node, vid, action))
@@ -69,13 +98,63 @@ class SpatialMemory(ViewMemory):
         self.last_node = vid
         return vid
 
-    def update_semantics(self, node_id, objects=None, scene_type=None):
+    def update_semantics(self, node_id, objects=None, scene_type=None, affordances=None, index=True):
         if node_id not in self.graph:
             return
         if objects is not None:
             self.graph[node_id]["objects"] = objects
         if scene_type is not None:
             self.graph[node_id]["scene_type"] = scene_type
+        if affordances is not None:
+            self.graph[node_id]["affordances"] = affordances
+
+        # Perceived nodes become places later views can be recognized as;
+        # reused semantics are not re-indexed so matches can't chain
+        if index and self.places is not None and node_id in self.descriptors:
+            self.places.add(node_id, self.descriptors[node_id], self.graph[node_id]["pose"])
+
+    def recognize_place(self, node_id):
+        """
+        Semantics of an earlier perceived node that `node_id` revisits,
+        or None when there is no confident match.
+        """
+        if self.places is None or node_id not in self.descriptors:
+            return None
+        match = self.places.match(self.descriptors[node_id], self.graph[node_id]["pose"], exclude=node_id)
+        if match is None:
+            return None
+        other, similarity = match
+        node = self.graph[other]
+        return {
+            "node_id": other,
+            "similarity": similarity,
+            "objects": list(node.get("objects") or []),
+            "scene_type": node.get("scene_type"),
+            "affordances": list(node.get("affordances") or []),
+        }
+
+    def integrate_depth(self, depth, pose):
+        if self.occupancy is None or depth is None:
+            return
+        self.occupancy.integrate(depth, pose)
+
+    def is_free(self, position):
+        if self.occupancy is None:
+            return None
+        return self.occupancy.is_free(position)
+
+    def find_nodes(self, obj=None, scene_type=None, affordance=None):
+        """Node ids whose semantics mention `obj` / `affordance` and/or match `scene_type`."""
+        out = []
+        for nid, node in self.graph.items():
+            if obj is not None and obj not in (node.get("objects") or []):
+                continue
+            if affordance is not None and affordance not in (node.get("affordances") or []):
+                continue
+            if scene_type is not None and node.get("scene_type") != scene_type:
+                continue
+            out.append(nid)
+        return out
 
     def get_recent_node(self):
         return self.last_node
@@ -84,7 +163,12 @@ class SpatialMemory(ViewMemory):
         return [k for k, v in self.graph.items() if not v.get("visited", False)]
 
     def summary(self):
-        return {
+        summary = {
             "num_nodes": len(self.graph),
             "num_edges": len(self.edges)
         }
+        if self.occupancy is not None:
+            summary["occupancy"] = self.occupancy.summary()
+        if self.places is not None:
+            summary["places"] = self.places.stats()
+        return summary
@@ -2,9 +2,7 @@ import json
 import os
 import re
 import numpy as np
-from typing import List, Dict, Any
-
-from scripts.qwen_backend import QwenVLMBackend
+from typing import List, Dict, Any, Optional
 
 try:
     import cv2
@@ -16,7 +14,23 @@ except ImportError:
 # ==========================================================
 # Symbolic action space (CONTROL CONTRACT)
 # ==========================================================
-ALLOWED_ACTIONS = {"move_forward", "rotate", "scan", "stop"}
+ALLOWED_ACTIONS = {"move_forward", "rotate", "scan", "stop", "goto"}
+
+PERCEPTION_PROMPT = """
+You are a perception system for a mobile robot.
+
+Return JSON only with this schema:
+{
+  "objects": { "door": {...}, "wall": {...}, ... },
+  "scene": { "room": {"type": "..."} },
+  "navigational_affordances": ["corridor", "open_space", "blocked", "door"]
+}
+
+Rules:
+- Only describe what is visible
+- Do NOT speculate
+- No extra text
+""".strip()
 
 
 class VLMReasoner:
@@ -27,9 +41,22 @@ class VLMReasoner:
     All control is synthesized deterministically for safety and reproducibility.
     """
 
-    def __init__(self):
-        print("[VLM] Initializing Qwen2-VL backend...")
-        self.backend = QwenVLMBackend()
+    def __init__(self, prompt=None, backend=None, background=False):
+        if backend is None:
+            # Imported here so backends without torch (gridworld) never load it
+            from scripts.qwen_backend import QwenVLMBackend
+            print("[VLM] Initializing Qwen2-VL backend...")
+            # background=True returns at once; the first reason() waits for the load
+            backend = QwenVLMBackend(background=background)
+        self.backend = backend
+        self.prompt = prompt or PERCEPTION_PROMPT
+
+    def close(self):
+        """Free the backend's model (waits for a background load first)."""
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            close()
+        self.backend = None
 
     # ==========================================================
     # PUBLIC API
@@ -39,9 +66,15 @@ class VLMReasoner:
         question: str,
         frame_paths: List[str],
         memory_summary: List[Dict[str, Any]],
+        exploration_plan: Optional[List[Dict[str, Any]]] = None,
+        landmarks: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
 
-        frame_paths = [p for p in frame_paths if p and os.path.exists(p)]
+        # Entries are file paths or in-memory PIL images (pipeline perception stage)
+        frame_paths = [
+            p for p in frame_paths
+            if p is not None and (not isinstance(p, str) or os.path.exists(p))
+        ]
         memory_summary = memory_summary[-6:] if memory_summary else []
 
         if not frame_paths:
@@ -54,17 +87,101 @@ class VLMReasoner:
             print("[VLM] Perception failure:", e)
             return self._offline_reasoning(question, frame_paths, memory_summary)
 
+        return self._finish(perception, frame_paths, memory_summary, exploration_plan, landmarks)
+
+    def reason_batch(
+        self,
+        question: str,
+        windows: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Offline variant of reason(): each window is a dict with
+        "frame_paths" and "memory_summary"; all perception runs in one
+        backend call.
+        """
+        prepared = []
+        for w in windows:
+            paths = [p for p in w.get("frame_paths", []) if p and os.path.exists(p)]
+            summary = (w.get("memory_summary") or [])[-6:]
+            prepared.append((paths, summary))
+
+        results = [None] * len(prepared)
+        todo = [i for i, (paths, _) in enumerate(prepared) if paths]
+
+        raws = []
+        if todo:
+            try:
+                raws = self.backend.run_batch(self.prompt, [prepared[i][0] for i in todo])
+            except Exception as e:
+                print("[VLM] Batch perception failure:", e)
+                raws = [None] * len(todo)
+
+        for i, raw in zip(todo, raws):
+            paths, summary = prepared[i]
+            try:
+                perception = self._parse_perception(raw)
+            except Exception as e:
+                print("[VLM] Perception failure:", e)
+                results[i] = self._offline_reasoning(question, paths, summary)
+                continue
+            results[i] = self._finish(perception, paths, summary, None)
+
+        for i, (paths, summary) in enumerate(prepared):
+            if results[i] is None:
+                results[i] = self._offline_reasoning(question, paths, summary)
+
+        return results
+
+    def recall(
+        self,
+        place: Dict[str, Any],
+        memory_summary: List[Dict[str, Any]],
+        exploration_plan: Optional[List[Dict[str, Any]]] = None,
+        landmarks: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        reason() for a recognized place: the matched node's semantics stand
+        in for perception, and actions come from the same synthesis rules.
+
+        `landmarks` (both here and in reason()) maps an object / affordance
+        to a remembered SpatialMemory node where it was seen.
+        """
+        memory_summary = memory_summary[-6:] if memory_summary else []
+        objects = place.get("objects") or []
+        scene_type = place.get("scene_type") or "unknown"
+        affordances = place.get("affordances") or []
+
+        scene_state = {
+            "objects": objects,
+            "scene_type": scene_type,
+            "affordances": affordances,
+            "uncertainties": [],
+            "summary": (
+                f"Revisited place {place['node_id']} "
+                f"(similarity {place['similarity']:.2f}). "
+                f"Objects: {objects}. Scene: {scene_type}. "
+                f"Affordances: {affordances}."
+            ),
+            "justification": "Reused perception of a recognized place.",
+            "confidence": max(0.1, min(place["similarity"], 0.9)),
+        }
+        return self._result(scene_state, [], memory_summary, exploration_plan, landmarks)
+
+    def _finish(self, perception, frame_paths, memory_summary, exploration_plan, landmarks=None):
         # ---------- SCENE ABSTRACTION ----------
         scene_state = self._build_scene_state(perception)
+        return self._result(scene_state, frame_paths, memory_summary, exploration_plan, landmarks)
 
+    def _result(self, scene_state, frame_paths, memory_summary, exploration_plan, landmarks=None):
         # ---------- ACTION SYNTHESIS ----------
-        next_actions = self._synthesize_actions(scene_state, memory_summary)
+        next_actions = self._synthesize_actions(scene_state, memory_summary, exploration_plan, landmarks)
 
         # ---------- FINAL OUTPUT ----------
         result = {
             "reasoning": scene_state["summary"],
             "visible_objects": scene_state["objects"],
             "scene_type_guess": scene_state["scene_type"],
+            "affordances": scene_state["affordances"],
             "uncertainties": scene_state["uncertainties"],
             "next_actions": next_actions,
             "justification": scene_state["justification"],
@@ -78,23 +195,13 @@ class VLMReasoner:
     # PERCEPTION (QWEN IS USED HERE ONLY)
     # ==========================================================
     def _run_perception(self, frame_paths: List[str]) -> Dict[str, Any]:
-        prompt = """
-You are a perception system for a mobile robot.
-
-Return JSON only with this schema:
-{
-  "objects": { "door": {...}, "wall": {...}, ... },
-  "scene": { "room": {"type": "..."} },
-  "navigational_affordances": ["corridor", "open_space", "blocked", "door"]
-}
+        raw = self.backend.run(self.prompt, frame_paths)
+        return self._parse_perception(raw)
 
-Rules:
-- Only describe what is visible
-- Do NOT speculate
-- No extra text
-""".strip()
+    def _parse_perception(self, raw: str) -> Dict[str, Any]:
+        if raw is None:
+            raise ValueError("No perception output")
 
-        raw = self.backend.run(prompt, frame_paths)
         parsed = self._safe_json_parse(raw)
 
         if not isinstance(parsed, dict):
@@ -159,7 +266,9 @@ Rules:
     def _synthesize_actions(
         self,
         scene_state: Dict[str, Any],
-        memory_summary: List[Dict[str, Any]]
+        memory_summary: List[Dict[str, Any]],
+        exploration_plan: Optional[List[Dict[str, Any]]] = None,
+        landmarks: Optional[Dict[str, str]] = None
     ) -> List[Dict[str, Any]]:
 
         actions = []
@@ -175,11 +284,20 @@ Rules:
         if scene_type in {"corridor", "hallway"} or "corridor" in affordances:
             return [{"action": "move_forward", "distance": 0.6}]
 
-        # ---------- Rule 3: Blocked or enclosed → rotate ----------
-        if "blocked" in affordances or "enclosed" in affordances:
+        # ---------- Rule 3: Blocked, door remembered elsewhere → go back to it ----------
+        blocked = "blocked" in affordances or "enclosed" in affordances
+        if blocked and landmarks and landmarks.get("door"):
+            return [{"action": "goto", "node": landmarks["door"]}]
+
+        # ---------- Rule 4: Blocked or enclosed → rotate ----------
+        if blocked:
             return [{"action": "rotate", "angle_deg": 60}]
 
-        # ---------- Rule 4: No structure → scan ----------
+        # ---------- Rule 5: No structure → head for a frontier ----------
+        if exploration_plan:
+            return list(exploration_plan)
+
+        # ---------- Rule 6: No structure, no planner → scan ----------
         return [
             {"action": "scan"},
             {"action": "rotate", "angle_deg": 30}
@@ -216,6 +334,7 @@ Rules:
             "reasoning": "Offline degraded perception mode.",
             "visible_objects": [],
             "scene_type_guess": "unknown",
+            "affordances": [],
             "uncertainties": ["VLM unavailable"],
             "next_actions": next_actions,
             "justification": justification,
@@ -232,6 +351,7 @@ Rules:
             "reasoning": "",
             "visible_objects": [],
             "scene_type_guess": "unknown",
+            "affordances": [],
             "uncertainties": [],
             "next_actions": [],
             "justification": "",
@@ -261,6 +381,11 @@ Rules:
                     "action": "rotate",
                     "angle_deg": int(act["angle_deg"])
                 })
+            elif act["action"] == "goto" and "node" in act:
+                cleaned.append({
+                    "action": "goto",
+                    "node": str(act["node"])
+                })
             elif act["action"] in {"scan", "stop"}:
                 cleaned.append({"action": act["action"]})
 
@@ -281,3 +406,28 @@ Rules:
                 except json.JSONDecodeError:
                     pass
         raise ValueError("Invalid JSON from VLM")
+
+
+class PipelinedReasoner(VLMReasoner):
+    """
+    VLMReasoner whose perception runs in a FramePipeline's perception
+    process. `frame_paths` passed to reason() are the ids of views that
+    were published to the pipeline; recall() and the action rules run
+    locally as usual. `backend` is the pipeline's PerceptionBudget, so
+    memory-governor budget changes reach the remote model.
+    """
+
+    def __init__(self, pipeline):
+        self.backend = pipeline.backend
+        self.prompt = None
+        self.pipeline = pipeline
+
+    def reason(
+        self,
+        question: str,
+        frame_paths: List[str],
+        memory_summary: List[Dict[str, Any]],
+        exploration_plan: Optional[List[Dict[str, Any]]] = None,
+        landmarks: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        return self.pipeline.reason(question, frame_paths, memory_summary, exploration_plan, landmarks)